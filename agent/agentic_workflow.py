@@ -1,53 +1,223 @@
 
+import json
+import threading
+from typing import Dict, Optional
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from utils.model_loader import ModelLoader
-from prompt_library.prompt import SYSTEM_PROMPT
+from utils.llm_cache import model_name_of, with_llm_cache
+from utils.quota import MeteredLLM
+from prompt_library.assembly import PromptAssembler, stable_tool_order
 from langgraph.graph import StateGraph, MessagesState, END, START
 from langgraph.prebuilt import ToolNode, tools_condition
+from utils.itinerary import ITINERARY_TOOL_NAME, Itinerary, find_itinerary_call, validate_itinerary
+from utils.agent_state import compact_ai_message, compact_state_enabled, get_tool_output_table
 from tools.weather_info_tool import WeatherInfoTool
 from tools.place_search_tool import PlaceSearchTool
 from tools.expense_calculator_tool import CalculatorTool
 from tools.currency_conversion_tool import CurrencyConverterTool
 
+# Itinerary calls per run; after the last failed one the agent is asked for Markdown
+MAX_ITINERARY_ATTEMPTS = 3
+
+# tool-calling turns per run before the router hands over to the main model
+MAX_ROUTER_TURNS = 6
+
+
+def _call_key(tool_call: dict) -> tuple:
+    return tool_call["name"], json.dumps(tool_call.get("args"), sort_keys=True, default=str)
+
+
 class GraphBuilder():
-    def __init__(self,model_provider: str = "groq"):
+    def __init__(self,model_provider: str = "groq", structured_output: bool = False, tiering: Optional[bool] = None):
+        self.model_provider = model_provider
         self.model_loader = ModelLoader(model_provider=model_provider)
-        self.llm = self.model_loader.load_llm()
+        # tiered: a small model picks tools, the (stronger) main model only writes the plan
+        self.tiered = self.model_loader.tiering_enabled() if tiering is None else tiering
+        if self.tiered:
+            self.llm = self.model_loader.load_llm(**self.model_loader.tier_settings("synthesis"))
+            self.routing_llm = self.model_loader.load_llm(**self.model_loader.tier_settings("routing"))
+        else:
+            self.llm = self.model_loader.load_llm()
+            self.routing_llm = None
         
         self.tools = []
         
         self.weather_tools = WeatherInfoTool()
         self.place_search_tools = PlaceSearchTool()
-        self.calculator_tools = CalculatorTool()
         self.currency_converter_tools = CurrencyConverterTool()
+        # the budget engine converts foreign-currency costs with the same (cached) rates
+        self.calculator_tools = CalculatorTool(currency_service=self.currency_converter_tools.currency_service)
         
         self.tools.extend([* self.weather_tools.weather_tool_list, 
                            * self.place_search_tools.place_search_tool_list,
                            * self.calculator_tools.calculator_tool_list,
                            * self.currency_converter_tools.currency_converter_tool_list])
+        # fixed tool order keeps the bound schemas byte-identical for provider prefix caching
+        self.tools = stable_tool_order(self.tools)
         
-        self.llm_with_tools = self.llm.bind_tools(tools=self.tools)
+        # in structured mode the final turn calls the Itinerary schema as a tool
+        self.structured_output = structured_output
+        bound_tools = self.tools + [Itinerary] if structured_output else self.tools
+        self.llm_with_tools = self._bind(self.llm, bound_tools)
         
         self.graph = None
+        # keep per-request state small: trimmed LLM responses, shared tool outputs
+        self.compact_state = compact_state_enabled()
+        self.tool_node = ToolNode(tools=self.tools)
         
-        self.system_prompt = SYSTEM_PROMPT
+        self.prompt = PromptAssembler(model_name_of(self.llm), structured_output=structured_output)
+        self.system_prompt = self.prompt.system_message
+
+        if self.tiered:
+            # the router never writes the plan, so it does not get the Itinerary schema
+            self.routing_llm_with_tools = self._bind(self.routing_llm, self.tools)
+            self.routing_tool_names = {t.name for t in self.tools}
+            self.routing_prompt = PromptAssembler(model_name_of(self.routing_llm))
+
+    def _bind(self, llm, tools):
+        """Bind tools; cache hits skip metering, real calls are budgeted and their tokens accounted"""
+        metered_llm = MeteredLLM(llm.bind_tools(tools=tools), self.model_provider, model_name_of(llm))
+        return with_llm_cache(metered_llm, llm, tools)
+    
+    def router_function(self, state: MessagesState):
+        """
+        Tool-selection turn on the small model. When it has no more tools to call
+        its draft answer is dropped and the turn escalates to the main model; so
+        does a router that has used MAX_ROUTER_TURNS or only repeats calls already
+        answered. Calls to tools it was not given (Itinerary) are dropped.
+        """
+        made = self._tool_calls_this_turn(state)
+        if len(made) >= MAX_ROUTER_TURNS:
+            return {"messages": []}
+        response = self.routing_llm_with_tools.invoke(self.routing_prompt.assemble(state["messages"]))
+        answered = {_call_key(c) for turn in made for c in turn}
+        calls = [tc for tc in getattr(response, "tool_calls", None) or []
+                 if tc["name"] in self.routing_tool_names and _call_key(tc) not in answered]
+        if not calls:
+            return {"messages": []}
+        if len(calls) != len(response.tool_calls):
+            response = AIMessage(content=response.content, tool_calls=calls, id=response.id,
+                                 usage_metadata=response.usage_metadata, response_metadata=response.response_metadata)
+        return {"messages": [compact_ai_message(response) if self.compact_state else response]}
+
+    @staticmethod
+    def _tool_calls_this_turn(state: MessagesState) -> list:
+        """Tool calls of each AI turn since the last human message, oldest first"""
+        turns = []
+        for m in reversed(state["messages"]):
+            if isinstance(m, HumanMessage):
+                break
+            if isinstance(m, AIMessage) and m.tool_calls:
+                turns.append(m.tool_calls)
+        return turns[::-1]
+
+    def route_after_router(self, state: MessagesState):
+        last = state["messages"][-1]
+        if isinstance(last, AIMessage) and last.tool_calls:
+            return "tools"
+        return "agent"
     
     
     def agent_function(self,state: MessagesState):
         """Main agent function"""
         user_question = state["messages"]
-        input_question = [self.system_prompt] + user_question
+        input_question = self.prompt.assemble(user_question)
         response = self.llm_with_tools.invoke(input_question)
+        if self.compact_state:
+            response = compact_ai_message(response)
         return {"messages": [response]}
+
+    def tools_function(self, state: MessagesState, config):
+        """Run the requested tools; identical outputs across concurrent plans share one string"""
+        result = self.tool_node.invoke(state, config)
+        table = get_tool_output_table()
+        for message in result["messages"]:
+            message.content = table.intern(message.content)
+        return result
+
+    def route_after_agent(self, state: MessagesState):
+        """
+        Like tools_condition, but a valid Itinerary call ends the run and an
+        invalid one goes back to the agent with the validation error
+        """
+        args = find_itinerary_call(state["messages"][-1])
+        if args is None:
+            return tools_condition(state)
+        if validate_itinerary(args)[0] is not None or self._itinerary_attempts(state) >= MAX_ITINERARY_ATTEMPTS:
+            return END
+        return "itinerary_feedback"
+
+    @staticmethod
+    def _itinerary_attempts(state: MessagesState) -> int:
+        """Itinerary calls in the current turn (since the last human message), the latest included"""
+        attempts = 1
+        for m in reversed(state["messages"]):
+            if isinstance(m, HumanMessage):
+                break
+            if isinstance(m, ToolMessage) and m.name == ITINERARY_TOOL_NAME:
+                attempts += 1
+        return attempts
+
+    def itinerary_feedback(self, state: MessagesState):
+        """Answer every call on an invalid Itinerary turn, so the agent can correct it (or fall back to Markdown)"""
+        last = state["messages"][-1]
+        _, error = validate_itinerary(find_itinerary_call(last))
+        if self._itinerary_attempts(state) + 1 >= MAX_ITINERARY_ATTEMPTS:
+            retry = "Do not call Itinerary again; write the complete plan as Markdown instead."
+        else:
+            retry = "Call Itinerary again with corrected arguments."
+        messages = []
+        for tc in last.tool_calls:
+            if tc["name"] == ITINERARY_TOOL_NAME:
+                content = f"Invalid Itinerary: {error}\n{retry}"
+            else:
+                content = "Not run: call Itinerary on its own, after all other tools."
+            messages.append(ToolMessage(content=content, tool_call_id=tc["id"], name=tc["name"]))
+        return {"messages": messages}
+
     def build_graph(self):
         graph_builder=StateGraph(MessagesState)
         graph_builder.add_node("agent", self.agent_function)
-        graph_builder.add_node("tools", ToolNode(tools=self.tools))
-        graph_builder.add_edge(START,"agent")
-        graph_builder.add_conditional_edges("agent",tools_condition)
-        graph_builder.add_edge("tools","agent")
+        graph_builder.add_node("tools", self.tools_function if self.compact_state else self.tool_node)
+        if self.tiered:
+            # router <-> tools until the router is done, then the main model writes the plan
+            # (or asks for more tools, which goes back through the router)
+            graph_builder.add_node("router", self.router_function)
+            graph_builder.add_edge(START,"router")
+            graph_builder.add_conditional_edges("router", self.route_after_router, ["tools", "agent"])
+            graph_builder.add_edge("tools","router")
+        else:
+            graph_builder.add_edge(START,"agent")
+            graph_builder.add_edge("tools","agent")
+        if self.structured_output:
+            graph_builder.add_node("itinerary_feedback", self.itinerary_feedback)
+            graph_builder.add_edge("itinerary_feedback", "agent")
+            graph_builder.add_conditional_edges("agent", self.route_after_agent, ["tools", "itinerary_feedback", END])
+        else:
+            graph_builder.add_conditional_edges("agent", tools_condition)
         graph_builder.add_edge("agent",END)
         self.graph = graph_builder.compile()
         return self.graph
         
     def __call__(self):
-        return self.build_graph()
\ No newline at end of file
+        return self.build_graph()
+
+
+_graphs: Dict[tuple, object] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_graph(model_provider: str = "groq", structured_output: bool = False):
+    """
+    Process-wide compiled graph. Per-request state lives in the stream, not in
+    the graph or its tools, so concurrent plans can share one instead of each
+    rebuilding the tools and their bound schemas.
+    """
+    key = (model_provider, structured_output)
+    graph = _graphs.get(key)
+    if graph is None:
+        with _graphs_lock:
+            graph = _graphs.get(key)
+            if graph is None:
+                graph = _graphs[key] = GraphBuilder(model_provider=model_provider, structured_output=structured_output)()
+    return graph
@@ -0,0 +1,80 @@
+"""
+Benchmark: bulk currency conversion vs. one convert() call per amount.
+
+The exchange-rate API is replaced by an in-process fake with a fixed latency
+so the numbers are reproducible offline. Caching is disabled for both paths,
+so this measures upstream fetches, not cache hits; quota budgets are lifted too.
+
+    python -m benchmarks.bench_currency --conversions 30 --latency 0.15
+"""
+import argparse
+import random
+import time
+
+import utils.cache
+import utils.replay
+from utils.currency_converter import CurrencyConverter
+from utils.quota import get_quota_manager
+
+# rates per 1 USD
+USD_RATES = {"USD": 1.0, "INR": 83.2, "EUR": 0.92, "GBP": 0.79, "AED": 3.67, "THB": 36.4, "SGD": 1.35, "JPY": 151.0}
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, base: str):
+        base_rate = USD_RATES[base]
+        self._json = {"conversion_rates": {c: r / base_rate for c, r in USD_RATES.items()}}
+
+    def json(self):
+        return self._json
+
+
+class _FakeRequests:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def get(self, url, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return _FakeResponse(url.rstrip("/").rsplit("/", 1)[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversions", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.15, help="simulated upstream latency in seconds")
+    args = parser.parse_args()
+
+    # measure upstream behaviour only
+    utils.cache._cache, utils.cache._cache_loaded = None, True
+    get_quota_manager().budgets = {}
+    fake = _FakeRequests(args.latency)
+    utils.replay.requests = fake
+
+    rng = random.Random(42)
+    currencies = ["INR", "USD", "EUR"]
+    triples = [(round(rng.uniform(10, 5000), 2), rng.choice(currencies), rng.choice(currencies)) for _ in range(args.conversions)]
+    converter = CurrencyConverter("bench")
+
+    fake.calls = 0
+    start = time.perf_counter()
+    per_call = [converter.convert(a, f, t) for a, f, t in triples]
+    per_call_time, per_call_fetches = time.perf_counter() - start, fake.calls
+
+    fake.calls = 0
+    start = time.perf_counter()
+    batch = converter.convert_many(triples)
+    batch_time, batch_fetches = time.perf_counter() - start, fake.calls
+
+    max_diff = max(abs(p - b["converted"]) / max(abs(p), 1e-9) for p, b in zip(per_call, batch))
+    print(f"{'path':<10}{'fetches':>10}{'seconds':>12}")
+    print(f"{'per-call':<10}{per_call_fetches:>10}{per_call_time:>12.3f}")
+    print(f"{'batch':<10}{batch_fetches:>10}{batch_time:>12.3f}")
+    print(f"speedup: {per_call_time / batch_time:.1f}x, max relative difference: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
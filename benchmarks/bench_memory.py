@@ -0,0 +1,182 @@
+"""
+Memory per in-flight plan on the /query path.
+
+Replays a recorded trace (see benchmarks/profile_query.py) for N concurrent
+plans started together, and reports the peak Python heap (tracemalloc) and
+the peak resident set growth, in total and per in-flight plan. The recorded
+latencies are kept by default so the plans really overlap.
+
+    python -m benchmarks.profile_query --record            # once, live APIs
+    python -m benchmarks.bench_memory --concurrency 16
+    python -m benchmarks.bench_memory --compare            # compact state off vs on
+
+Each configuration runs in a fresh process, since the allocator rarely gives
+memory back and a second run in the same process would look cheaper.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+DEFAULT_TRACE = "./traces/query.jsonl.gz"
+QUESTION = "Plan a trip to Gokarna for 5 days"
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    # peak, not current, where /proc is unavailable (KiB on Linux, bytes on macOS)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class _RSSSampler(threading.Thread):
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            time.sleep(self.interval)
+
+    def stop(self) -> int:
+        self._done.set()
+        self.join()
+        return max(self.peak, _rss_bytes())
+
+
+def _plan(question: str, barrier: threading.Barrier = None, errors: list = None):
+    from main import QueryRequest, plan_events
+    from utils.quota import begin_request
+    from utils.response_encoding import dumps
+
+    if barrier is not None:
+        barrier.wait()
+    try:
+        begin_request("bench")
+        for kind, payload in plan_events(QueryRequest(question=question)):
+            if kind == "plan":
+                # include serializing the response, as /query does
+                dumps(payload)
+    except Exception as e:
+        if errors is not None:
+            errors.append(repr(e))
+        else:
+            raise
+
+
+def _batch(question: str, concurrency: int) -> list:
+    barrier = threading.Barrier(concurrency)
+    errors = []
+    threads = [threading.Thread(target=_plan, args=(question, barrier, errors)) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def measure(args) -> dict:
+    os.environ["VOYAGEMATE_REPLAY_MODE"] = "replay"
+    os.environ["VOYAGEMATE_REPLAY_FILE"] = args.trace
+    os.environ["VOYAGEMATE_REPLAY_LATENCY"] = args.latency
+    for key in ("GROQ_API_KEY", "FOURSQUARE_API_KEY", "LOCATIONIQ_API_KEY", "OPENWEATHER_API_KEY",
+                "EXCHANGERATE_API_KEY", "TAVILY_API_KEY"):
+        os.environ.setdefault(key, "replay")
+
+    import gc
+    import utils.cache
+    from utils.agent_state import compact_state_enabled
+    from utils.quota import get_quota_manager
+
+    # every plan takes the full path, not the plan cache, and no budget cuts the batch short
+    utils.cache._cache, utils.cache._cache_loaded = None, True
+    get_quota_manager().budgets = {}
+    # warm up imports, graph construction and tool schemas outside the measurement
+    _plan(args.question)
+    gc.collect()
+
+    sampler = _RSSSampler()
+    rss_before = _rss_bytes()
+    sampler.start()
+    start = time.perf_counter()
+    errors = _batch(args.question, args.concurrency)
+    elapsed = time.perf_counter() - start
+    rss_peak = sampler.stop()
+
+    gc.collect()
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    errors += _batch(args.question, args.concurrency)
+    heap_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if errors:
+        raise SystemExit(f"{len(errors)} plans failed, e.g. {errors[0]}")
+    n = args.concurrency
+    return {
+        "compact_state": compact_state_enabled(),
+        "concurrency": n,
+        "seconds": round(elapsed, 3),
+        "heap_peak_kib": round((heap_peak - heap_before) / 1024, 1),
+        "heap_per_plan_kib": round((heap_peak - heap_before) / 1024 / n, 1),
+        "rss_growth_kib": round((rss_peak - rss_before) / 1024, 1),
+        "rss_per_plan_kib": round((rss_peak - rss_before) / 1024 / n, 1),
+    }
+
+
+def _print(rows: list):
+    print(f"{'compact':<9}{'plans':>6}{'seconds':>9}{'heap_kib':>11}{'heap/plan':>11}{'rss_kib':>10}{'rss/plan':>10}")
+    for r in rows:
+        print(f"{str(r['compact_state']):<9}{r['concurrency']:>6}{r['seconds']:>9.3f}{r['heap_peak_kib']:>11.1f}"
+              f"{r['heap_per_plan_kib']:>11.1f}{r['rss_growth_kib']:>10.1f}{r['rss_per_plan_kib']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--question", default=QUESTION, help="must match the recorded trace")
+    parser.add_argument("--trace", default=DEFAULT_TRACE)
+    parser.add_argument("--concurrency", type=int, default=16, help="plans in flight at once")
+    parser.add_argument("--latency", choices=["original", "zero"], default="original")
+    parser.add_argument("--compare", action="store_true", help="run with compact state off and on, each in its own process")
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    args = parser.parse_args()
+
+    if args.compare:
+        rows = []
+        for flag in ("0", "1"):
+            cmd = [sys.executable, "-m", "benchmarks.bench_memory", "--json", "--question", args.question,
+                   "--trace", args.trace, "--concurrency", str(args.concurrency), "--latency", args.latency]
+            proc = subprocess.run(cmd, env={**os.environ, "VOYAGEMATE_COMPACT_STATE": flag}, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise SystemExit(f"run with VOYAGEMATE_COMPACT_STATE={flag} failed:\n{proc.stderr[-2000:]}")
+            rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        _print(rows)
+        off, on = rows
+        if off["heap_per_plan_kib"]:
+            print(f"compact state: heap per plan {100 * (on['heap_per_plan_kib'] / off['heap_per_plan_kib'] - 1):+.1f}%, "
+                  f"rss per plan {on['rss_per_plan_kib'] - off['rss_per_plan_kib']:+.1f} KiB")
+        return
+
+    result = measure(args)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        _print([result])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Prompt-size regression benchmark.
+
+For every system prompt variant, reports the prompt size of one agent turn
+(system prompt + bound tool schemas + question). Token counts use tiktoken
+when installed and a chars/4 estimate otherwise. With --live, each variant is
+also streamed from the configured provider to report time-to-first-token and
+the provider-reported prompt tokens; repeated runs show the effect of
+provider prefix caching.
+
+    python -m benchmarks.bench_prompt
+    python -m benchmarks.bench_prompt --live --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from prompt_library.assembly import PromptAssembler
+from prompt_library.prompt import PROMPT_VARIANTS
+from utils.llm_cache import model_name_of
+
+QUESTION = "Plan a trip to Gokarna for 5 days"
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+except Exception:  # tiktoken missing or its encoding cannot be downloaded
+    def count_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+
+def _build_graph(live: bool):
+    if not live:
+        # schemas only: the provider wrappers just need keys to construct
+        for key in ("GROQ_API_KEY", "FOURSQUARE_API_KEY", "OPENWEATHER_API_KEY", "EXCHANGERATE_API_KEY", "TAVILY_API_KEY"):
+            os.environ.setdefault(key, "offline")
+    from agent.agentic_workflow import GraphBuilder
+    return GraphBuilder(model_provider="groq")
+
+
+def _ttft(llm_with_tools, messages) -> tuple:
+    start = time.perf_counter()
+    first = None
+    usage = None
+    for chunk in llm_with_tools.stream(messages):
+        if first is None:
+            first = time.perf_counter() - start
+        usage = getattr(chunk, "usage_metadata", None) or usage
+    return first, (usage or {}).get("input_tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="stream from the provider to measure time-to-first-token")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    graph = _build_graph(args.live)
+    schema_text = json.dumps([convert_to_openai_tool(t) for t in graph.tools], sort_keys=True)
+    schema_tokens = count_tokens(schema_text)
+    bound = graph.llm.bind_tools(tools=graph.tools)
+
+    header = f"{'variant':<10}{'system':>8}{'tools':>8}{'total':>8}"
+    if args.live:
+        header += f"{'ttft_first':>12}{'ttft_median':>13}{'provider_tokens':>17}"
+    print(header)
+    for variant in PROMPT_VARIANTS:
+        assembler = PromptAssembler(model_name_of(graph.llm), variant=variant)
+        messages = assembler.assemble([HumanMessage(content=QUESTION)])
+        system_tokens = count_tokens(assembler.system_message.content)
+        total = system_tokens + schema_tokens + count_tokens(QUESTION)
+        line = f"{variant:<10}{system_tokens:>8}{schema_tokens:>8}{total:>8}"
+        if args.live:
+            runs = [_ttft(bound, messages) for _ in range(args.repeat)]
+            ttfts = [r[0] for r in runs if r[0] is not None]
+            line += f"{ttfts[0]:>12.3f}{statistics.median(ttfts):>13.3f}{str(runs[-1][1]):>17}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
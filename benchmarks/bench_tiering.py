@@ -0,0 +1,143 @@
+"""
+Model tiering benchmark: single model vs. routing + synthesis models.
+
+Runs a corpus of planning questions through the agent graph in both modes
+from recorded traces (utils/replay.py), so the comparison is offline and
+repeatable. Latency is end-to-end graph time with every call replayed at
+its recorded latency; token cost uses the quota price table in config.yaml.
+
+Record the corpus once against the live APIs (one trace per mode and question):
+
+    python -m benchmarks.bench_tiering --record
+
+then compare as often as needed:
+
+    python -m benchmarks.bench_tiering
+    python -m benchmarks.bench_tiering --latency zero --structured
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+from collections import Counter
+
+CORPUS_DIR = "./traces/tiering"
+QUESTIONS = [
+    "Plan a trip to Gokarna for 5 days",
+    "Plan a 3 day budget trip to Jaipur for two people",
+    "Weekend trip to Pondicherry with beaches and cafes",
+    "Plan a 7 day family holiday in Kerala: Munnar and Alleppey",
+    "4 days in Bangkok on a mid-range budget, costs in INR",
+]
+MODES = {"single": False, "tiered": True}
+
+
+def _slug(question: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", question.lower()).strip("-")[:60]
+
+
+def _trace_path(corpus: str, mode: str, question: str, structured: bool) -> str:
+    return os.path.join(corpus, f"{mode}{'-structured' if structured else ''}-{_slug(question)}.jsonl.gz")
+
+
+def _use_trace(path: str, mode: str, latency: str):
+    """Point the process-wide record/replay store at one trace file."""
+    import utils.replay
+    store = utils.replay.TraceStore(path, mode, latency)
+    utils.replay._store, utils.replay._store_loaded = store, True
+    return store
+
+
+def _run(question: str, tiered: bool, structured: bool) -> tuple:
+    from langchain_core.messages import HumanMessage
+    from agent.agentic_workflow import GraphBuilder
+    from utils.quota import begin_request
+
+    app = GraphBuilder(model_provider="groq", structured_output=structured, tiering=tiered)()
+    usage = begin_request("bench")
+    start = time.perf_counter()
+    app.invoke({"messages": [HumanMessage(content=question)]})
+    return time.perf_counter() - start, usage.summary()
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="directory of recorded traces")
+    parser.add_argument("--questions", help="file with one question per line (default: built-in corpus)")
+    parser.add_argument("--record", action="store_true", help="record missing traces against the live APIs")
+    parser.add_argument("--latency", choices=["original", "zero"], default="original")
+    parser.add_argument("--structured", action="store_true")
+    args = parser.parse_args()
+
+    questions = QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    import utils.cache
+    if not args.record:
+        # nothing is sent upstream; the wrappers just need keys to construct
+        for key in ("GROQ_API_KEY", "FOURSQUARE_API_KEY", "LOCATIONIQ_API_KEY", "OPENWEATHER_API_KEY",
+                    "EXCHANGERATE_API_KEY", "TAVILY_API_KEY"):
+            os.environ.setdefault(key, "replay")
+    # every plan takes the full path, not the shared cache
+    utils.cache._cache, utils.cache._cache_loaded = None, True
+
+    results = {}
+    for mode, tiered in MODES.items():
+        rows = []
+        for question in questions:
+            path = _trace_path(args.corpus, mode, question, args.structured)
+            if args.record:
+                if os.path.exists(path):
+                    continue
+                store = _use_trace(path, "record", args.latency)
+                _run(question, tiered, args.structured)
+                store.close()
+                print(f"recorded {store.recorded} calls: {path}")
+                continue
+            if not os.path.exists(path):
+                print(f"skipping ({mode}): no trace for {question!r}, run with --record")
+                continue
+            _use_trace(path, "replay", args.latency)
+            rows.append(_run(question, tiered, args.structured))
+        results[mode] = rows
+
+    if args.record:
+        return
+
+    print(f"{'mode':<8}{'plans':>6}{'median_s':>10}{'p90_s':>8}{'llm_calls':>11}{'in_tok':>9}{'out_tok':>9}"
+          f"{'cost_usd':>11}{'usd/plan':>11}")
+    summary = {}
+    for mode, rows in results.items():
+        if not rows:
+            continue
+        latencies = [r[0] for r in rows]
+        llm = [r[1]["llm"] for r in rows]
+        calls = sum(r[1]["provider_calls"].get("groq", 0) for r in rows)
+        cost = sum(r[1]["estimated_cost_usd"] for r in rows)
+        summary[mode] = (statistics.median(latencies), cost / len(rows))
+        print(f"{mode:<8}{len(rows):>6}{statistics.median(latencies):>10.3f}{_percentile(latencies, 0.9):>8.3f}{calls:>11}"
+              f"{sum(u['input_tokens'] for u in llm):>9}{sum(u['output_tokens'] for u in llm):>9}"
+              f"{cost:>11.6f}{cost / len(rows):>11.6f}")
+        models = Counter()
+        for u in llm:
+            for model, counts in u.get("models", {}).items():
+                models[model] += counts.get("input_tokens", 0) + counts.get("output_tokens", 0)
+        if len(models) > 1:
+            print("        tokens by model: " + ", ".join(f"{m}={n}" for m, n in models.most_common()))
+
+    if "single" in summary and "tiered" in summary:
+        (base_latency, base_cost), (latency, cost) = summary["single"], summary["tiered"]
+        print(f"tiered vs single: median latency {100 * (latency / base_latency - 1):+.1f}%, "
+              f"cost per plan {100 * (cost / base_cost - 1) if base_cost else 0.0:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Offline /query performance run and profile from a recorded trace.
+
+Record a trace once against the live LLM and provider APIs:
+
+    python -m benchmarks.profile_query --record --question "Plan a trip to Gokarna for 5 days"
+
+then replay it as often as needed with no network access, timing each run
+and writing a cProfile of the whole request (FastAPI app, graph, tools):
+
+    python -m benchmarks.profile_query --latency zero --runs 5 --profile query.prof
+    python -m snakeviz query.prof        # or: flameprof query.prof > query.svg
+
+cProfile sees the request thread; tools that LangGraph runs in parallel
+execute in worker threads, which a sampling profiler captures as well:
+
+    py-spy record -o query.svg -- python -m benchmarks.profile_query --latency zero --runs 20
+
+The shared caches are disabled so every run takes the full path.
+"""
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import statistics
+import time
+
+DEFAULT_TRACE = "./traces/query.jsonl.gz"
+QUESTION = "Plan a trip to Gokarna for 5 days"
+
+
+def _configure(args):
+    os.environ["VOYAGEMATE_REPLAY_MODE"] = "record" if args.record else "replay"
+    os.environ["VOYAGEMATE_REPLAY_FILE"] = args.trace
+    os.environ["VOYAGEMATE_REPLAY_LATENCY"] = args.latency
+    if not args.record:
+        # nothing is sent upstream; the wrappers just need keys to construct
+        for key in ("GROQ_API_KEY", "FOURSQUARE_API_KEY", "LOCATIONIQ_API_KEY", "OPENWEATHER_API_KEY",
+                    "EXCHANGERATE_API_KEY", "TAVILY_API_KEY"):
+            os.environ.setdefault(key, "replay")
+
+
+async def _query(app, payload: dict) -> dict:
+    import httpx
+    # in-process ASGI call: the request runs on this thread, visible to cProfile
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        resp = await client.post("/query", json=payload)
+    data = resp.json()
+    if resp.status_code != 200:
+        raise SystemExit(f"/query failed ({resp.status_code}): {data.get('error')}")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--question", default=QUESTION)
+    parser.add_argument("--structured", action="store_true")
+    parser.add_argument("--trace", default=DEFAULT_TRACE, help="gzip'd JSON-lines trace file")
+    parser.add_argument("--record", action="store_true", help="call the live APIs once and write the trace")
+    parser.add_argument("--latency", choices=["original", "zero"], default="zero",
+                        help="replay each call with its recorded latency or none")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profile", help="write cProfile stats of the replayed runs to this file")
+    parser.add_argument("--top", type=int, default=25, help="functions to print, by cumulative time")
+    args = parser.parse_args()
+    _configure(args)
+
+    import utils.cache
+    from utils.replay import get_trace_store
+    from main import app
+
+    # measure the full path, not plan/tool cache hits
+    utils.cache._cache, utils.cache._cache_loaded = None, True
+    payload = {"question": args.question, "structured": args.structured}
+
+    if args.record:
+        data = asyncio.run(_query(app, payload))
+        get_trace_store().close()
+        print(f"recorded {get_trace_store().recorded} calls to {args.trace}")
+        print(f"tools used: {', '.join(data.get('tools_used', [])) or '-'}")
+        return
+
+    profiler = cProfile.Profile()
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        profiler.enable()
+        asyncio.run(_query(app, payload))
+        profiler.disable()
+        timings.append(time.perf_counter() - start)
+
+    store = get_trace_store()
+    print(f"{'runs':<8}{'median_s':>10}{'min_s':>10}{'max_s':>10}{'replayed':>10}")
+    print(f"{args.runs:<8}{statistics.median(timings):>10.3f}{min(timings):>10.3f}{max(timings):>10.3f}{store.replayed:>10}")
+    if args.profile:
+        profiler.dump_stats(args.profile)
+        print(f"profile written to {args.profile}")
+    if args.top:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+class QuotaExceededError(Exception):
+    """Raised when an upstream provider's minute or daily budget is used up."""
+
+    def __init__(self, provider: str, window: str, limit: int):
+        self.provider = provider
+        self.window = window
+        self.limit = limit
+        super().__init__(f"{provider} {window} budget of {limit} calls exhausted")
+
+
+class ReplayMissError(KeyError):
+    """Raised in replay mode when a call has no recorded response in the trace."""
+
+    def __init__(self, key: str, path: str):
+        self.key = key
+        self.path = path
+        super().__init__(f"no recorded response for {key} in {path}")
@@ -1,12 +1,24 @@
 # main.py (replace your existing file)
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Literal, Optional
+from langchain_core.messages import AIMessage, HumanMessage
 from dotenv import load_dotenv
 import os
 import datetime
+import json
 import re
+from utils.itinerary import ITINERARY_TOOL_NAME, find_itinerary_call, itinerary_to_sections, parse_itinerary
+from utils.save_to_document import EXPORT_FORMATS, accel_redirect_path, get_exporter
+from prompt_library.prompt import REPLAN_PROMPT
+from utils.currency_converter import Conversion, CurrencyConverter
+from utils.quota import begin_request, get_quota_manager
+from utils.config_loader import load_config
+from utils.response_encoding import compact_sections, expand_sections, plan_response
+from utils.agent_state import compact_state_enabled
+from exception.exceptionhandling import QuotaExceededError
 
 load_dotenv()
 app = FastAPI()
@@ -28,9 +40,27 @@ def root():
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    from utils.single_flight import single_flight_stats
+    from utils.llm_cache import get_llm_cache
+    from utils.knowledge_base import get_knowledge_base
+    llm_cache = get_llm_cache()
+    knowledge_base = get_knowledge_base()
+    return {
+        "single_flight": single_flight_stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "quotas": get_quota_manager().stats(),
+        "knowledge_base": knowledge_base.stats() if knowledge_base else None,
+    }
+
 
 class QueryRequest(BaseModel):
     question: str
+    # ask the agent for a schema-validated itinerary instead of free Markdown
+    structured: bool = False
+    # continue an existing conversation (returned by a previous /query) instead of starting over
+    session_id: Optional[str] = None
 
 def split_sections(text: str) -> dict:
     """
@@ -143,22 +173,24 @@ def split_sections(text: str) -> dict:
     day_by_day = []
     # Common markers: "Day 1:", "Day 1 -", "Day 1", "Day 01"
     day_line_regex = re.compile(r'^\s*(?:Day|D)\s*0*\d+\b', flags=re.I)
-    lines = (sections.get("Generic Tourist Plan", "") + "\n" + sections.get("Off-Beat Plan", "") + "\n" + intro).splitlines()
-    current_day = None
-    current_content = []
-    for ln in lines:
-        if day_line_regex.match(ln):
-            # push previous
-            if current_day:
-                day_by_day.append({"day": current_day, "text": "\n".join(current_content).strip()})
-            # start new
-            current_day = ln.strip()
-            current_content = []
-        else:
-            if current_day:
-                current_content.append(ln)
-    if current_day:
-        day_by_day.append({"day": current_day, "text": "\n".join(current_content).strip()})
+    # each day is tagged with the plan it belongs to, so "Day 1" of the two plans stay apart
+    for plan, block in (("generic", sections.get("Generic Tourist Plan", "")),
+                        ("offbeat", sections.get("Off-Beat Plan", "")), ("", intro)):
+        current_day = None
+        current_content = []
+        for ln in block.splitlines():
+            if day_line_regex.match(ln):
+                # push previous
+                if current_day:
+                    day_by_day.append({"day": current_day, "text": "\n".join(current_content).strip(), "plan": plan})
+                # start new
+                current_day = ln.strip()
+                current_content = []
+            else:
+                if current_day:
+                    current_content.append(ln)
+        if current_day:
+            day_by_day.append({"day": current_day, "text": "\n".join(current_content).strip(), "plan": plan})
 
     # If we didn't find day_by_day above, also try finding a block that mentions "Day-by-Day" or "Day-by day" and then split by "Day X"
     if not day_by_day:
@@ -173,7 +205,7 @@ def split_sections(text: str) -> dict:
                 first_line = p.splitlines()[0].strip()
                 if day_line_regex.match(first_line):
                     rest = "\n".join(p.splitlines()[1:]).strip()
-                    day_by_day.append({"day": first_line, "text": rest})
+                    day_by_day.append({"day": first_line, "text": rest, "plan": ""})
 
     # 6) Cost parsing (same heuristics)
     cost_info = sections.get("Cost Breakdown", "")
@@ -227,7 +259,7 @@ def split_sections(text: str) -> dict:
         "costs": costs,
         "weather": weather.strip() if weather else "",
         "daily_budget": sections.get("Daily Expense Budget", ""),
-        "day_by_day": day_by_day,   # list of {"day": "...", "text": "..."}
+        "day_by_day": day_by_day,   # list of {"day": "...", "text": "...", "plan": "generic" | "offbeat" | ""}
         "attractions_list": attractions[:40],
         "raw": raw_text,
         "tools_used": tools_used,
@@ -235,30 +267,243 @@ def split_sections(text: str) -> dict:
 
     return parsed
 
-@app.post("/query")
-async def query_travel_agent(query: QueryRequest):
-    try:
-        # call your existing agentic GraphBuilder
-        from agent.agentic_workflow import GraphBuilder
-        graph = GraphBuilder(model_provider="groq")
-        react_app = graph()
-        messages = {"messages": [query.question]}
-        output = react_app.invoke(messages)
-
-        # extract assistant text — your agent returns dict or string; be defensive
-        assistant_text = ""
-        if isinstance(output, dict) and "messages" in output:
-            last = output["messages"][-1]
-            if hasattr(last, "content"):
-                assistant_text = last.content
-            else:
-                assistant_text = str(last)
+def called_tools(messages: list) -> list:
+    """Names of the tools the agent called, in first-use order."""
+    names = []
+    for m in messages:
+        for tc in getattr(m, "tool_calls", None) or []:
+            if tc["name"] != ITINERARY_TOOL_NAME and tc["name"] not in names:
+                names.append(tc["name"])
+    return names
+
+def agent_events(messages: list, structured_output: bool = False):
+    """
+    Run the agent graph on `messages`.
+    Yields ("status", text) as tools are called, ("section", (name, data)) for sections known
+    before the plan is written (the per-day forecast, as soon as its tool returns), then
+    ("result", (parsed sections, full message history)).
+    """
+    # call your existing agentic GraphBuilder
+    from agent.agentic_workflow import GraphBuilder, get_graph
+    if compact_state_enabled():
+        # one shared graph: tools and bound schemas are not rebuilt per request
+        react_app = get_graph("groq", structured_output)
+    else:
+        react_app = GraphBuilder(model_provider="groq", structured_output=structured_output)()
+    output = None
+    for mode, chunk in react_app.stream({"messages": messages}, stream_mode=["updates", "values"]):
+        if mode == "values":
+            output = chunk
+            continue
+        for update in chunk.values():
+            for m in (update or {}).get("messages", []):
+                names = [tc["name"] for tc in getattr(m, "tool_calls", None) or [] if tc["name"] != ITINERARY_TOOL_NAME]
+                if names:
+                    yield "status", "Calling " + ", ".join(names)
+                forecast = daily_weather([m])
+                if forecast:
+                    yield "section", ("daily_weather", forecast)
+
+    # extract assistant text — your agent returns dict or string; be defensive
+    assistant_text = ""
+    itinerary = None
+    history = []
+    if isinstance(output, dict) and "messages" in output:
+        history = output["messages"]
+        last = history[-1]
+        if hasattr(last, "content"):
+            assistant_text = last.content
         else:
-            assistant_text = str(output)
+            assistant_text = str(last)
+        if structured_output:
+            itinerary = parse_itinerary(find_itinerary_call(last))
+    else:
+        assistant_text = str(output)
+
+    if itinerary is not None:
+        sections = itinerary_to_sections(itinerary, tools_used=called_tools(history))
+    elif structured_output and not str(assistant_text).strip():
+        # every Itinerary attempt failed validation and no Markdown came back
+        raise ValueError("The agent did not return a valid itinerary")
+    else:
+        # free Markdown, or a structured answer that failed validation
+        sections = split_sections(assistant_text)
+    sections["daily_weather"] = daily_weather(history)
+    yield "result", (sections, history)
+
+def run_agent(messages: list, structured_output: bool = False):
+    """Run the agent graph on `messages`; return (parsed sections, full message history)."""
+    for kind, payload in agent_events(messages, structured_output):
+        if kind == "result":
+            return payload
+
+def daily_weather(messages: list) -> list:
+    """Per-day weather summaries from the latest forecast tool result."""
+    for m in reversed(messages):
+        if getattr(m, "type", None) == "tool" and getattr(m, "name", None) == "get_weather_forecast" and getattr(m, "artifact", None):
+            return m.artifact
+    return []
+
+def plan_events(query: QueryRequest):
+    """
+    Plan (or re-plan) for a query, using the plan cache and sessions.
+    Yields ("status", text) and early ("section", (name, data)) events while the agent runs,
+    and finally ("plan", response dict).
+    """
+    from utils.cache import get_cache, make_key
+    from utils.session_store import get_session_store, merge_sections
+
+    sessions = get_session_store()
+    session = sessions.load(query.session_id) if query.session_id else None
+    session_id = query.session_id if session is not None else sessions.new_id()
+
+    cache = get_cache()
+    cache_key = make_key(" ".join(query.question.lower().split()), query.structured)
+    if session is None:
+        # identical first questions are served from the shared plan cache
+        if cache is not None:
+            cached_plan = cache.get("plans", cache_key)
+            if cached_plan is not None:
+                cached_plan = expand_sections(cached_plan)
+                sessions.save(session_id, [HumanMessage(content=query.question), AIMessage(content=cached_plan.get("raw", ""))], cached_plan)
+                yield "plan", {**cached_plan, "session_id": session_id, "plan_cache_hit": True}
+                return
+        messages = [HumanMessage(content=query.question)]
+    else:
+        # follow-up: continue the conversation so earlier tool results are reused
+        history, previous = session
+        messages = history + [HumanMessage(content=REPLAN_PROMPT.format(question=query.question))]
+
+    for kind, payload in agent_events(messages, structured_output=query.structured):
+        if kind in ("status", "section"):
+            yield kind, payload
+    structured, history = payload
+    if session is not None and not query.structured:
+        structured = merge_sections(previous, structured)
+    elif session is None and cache is not None and structured.get("raw"):
+        # stored as offsets into raw rather than copies of its slices
+        cache.set("plans", cache_key, compact_sections(structured))
+
+    sessions.save(session_id, history, structured)
+    yield "plan", {**structured, "session_id": session_id}
 
-        structured = split_sections(assistant_text)
-        return JSONResponse(status_code=200, content=structured)
+# unauthenticated, so only configured behind a proxy that sets it (see quotas.tenant_header)
+TENANT_HEADER = os.environ.get("VOYAGEMATE_TENANT_HEADER", load_config().get("quotas", {}).get("tenant_header") or "")
+
+def tenant_of(request: Request) -> str:
+    return (request.headers.get(TENANT_HEADER) if TENANT_HEADER else None) or "default"
+
+@app.post("/query")
+def query_travel_agent(query: QueryRequest, request: Request,
+                       fmt: Literal["full", "compact"] = Query("full", alias="format"),
+                       fields: Optional[str] = None):
+    """
+    Plan a trip. `?format=compact` sends text sections as [start, end] offsets into `raw`,
+    `?fields=day_by_day,costs` returns only those sections; large plans are gzip/brotli
+    compressed when the client accepts it.
+    A plain `def`: the blocking graph run goes to the threadpool, so plans in one worker
+    run concurrently (and can share upstream calls) instead of holding the event loop.
+    """
+    usage = begin_request(tenant_of(request))
+    try:
+        for kind, payload in plan_events(query):
+            if kind == "plan":
+                return plan_response({**payload, "_meta": usage.summary()}, fmt, fields,
+                                     request.headers.get("accept-encoding"))
+    except QuotaExceededError as e:
+        return JSONResponse(status_code=429, content={"error": str(e), "_meta": usage.summary()})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+# order in which /query/stream emits sections, most useful first
+STREAM_SECTION_ORDER = ["weather", "daily_weather", "day_by_day", "generic_plan", "offbeat_plan", "costs",
+                        "cost_breakdown_text", "daily_budget", "attractions_list", "intro", "tools_used", "raw"]
+
+@app.post("/query/stream")
+async def query_travel_agent_stream(query: QueryRequest, request: Request):
+    """
+    Same as /query, streamed as newline-delimited JSON events: {"event": "status"} while
+    tools run, and {"event": "section"} per plan section, then {"event": "done"}.
+    The per-day forecast is sent as soon as its tool returns; the other sections
+    come from the finished plan, so they arrive together at the end of the run.
+    """
+    # set in the request task so the context (and this usage object) reaches the streaming threads
+    usage = begin_request(tenant_of(request))
+
+    def section(name, data):
+        return json.dumps({"event": "section", "name": name, "data": data}, ensure_ascii=False) + "\n"
+
+    def events():
+        sent = {}
+        try:
+            for kind, payload in plan_events(query):
+                if kind == "status":
+                    yield json.dumps({"event": "status", "message": payload}) + "\n"
+                    continue
+                if kind == "section":
+                    name, data = payload
+                    sent[name] = data
+                    yield section(name, data)
+                    continue
+                for name in STREAM_SECTION_ORDER + [k for k in payload if k not in STREAM_SECTION_ORDER and k not in ("session_id", "plan_cache_hit")]:
+                    if name in payload and (name not in sent or sent[name] != payload[name]):
+                        yield section(name, payload[name])
+                yield json.dumps({"event": "done", "session_id": payload.get("session_id"), "_meta": usage.summary()}) + "\n"
+        except Exception as e:
+            yield json.dumps({"event": "error", "error": str(e)}) + "\n"
 
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+class ExportRequest(BaseModel):
+    sections: dict
+    formats: List[str] = ["md"]
+
+@app.post("/export")
+def export_plan(req: ExportRequest):
+    """Queue a plan export; files are written in the background and named by content hash"""
+    try:
+        names = get_exporter().submit(req.sections, req.formats)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {fmt: {"file": name, "url": f"/exports/{name}"} for fmt, name in names.items()}
+
+@app.get("/exports/{name}")
+def download_export(name: str):
+    """
+    Download an exported file. Behind nginx with `exports.accel_redirect` set,
+    the proxy serves the file itself (sendfile, zero-copy); otherwise it is
+    read and streamed in chunks by FileResponse. An export still being written
+    answers 202, one that failed 500 with its error.
+    """
+    exporter = get_exporter()
+    path = exporter.path_for(name)
+    if path is None:
+        if exporter.is_pending(name):
+            return JSONResponse(status_code=202, content={"status": "pending"})
+        error = exporter.error_for(name)
+        if error is not None:
+            return JSONResponse(status_code=500, content={"status": "failed", "error": error})
+        return JSONResponse(status_code=404, content={"error": "export not found"})
+    media_type = EXPORT_FORMATS.get(name.rsplit(".", 1)[-1], "application/octet-stream")
+    internal = accel_redirect_path(name)
+    if internal is not None:
+        return Response(media_type=media_type, headers={
+            "X-Accel-Redirect": internal,
+            "Content-Disposition": f'attachment; filename="{name}"',
+        })
+    return FileResponse(path, media_type=media_type, filename=name)
+
+
+class ConvertRequest(BaseModel):
+    conversions: List[Conversion]
+
+@app.post("/convert")
+def convert_currencies(req: ConvertRequest):
+    """Bulk currency conversion against one cached rate table"""
+    try:
+        converter = CurrencyConverter(os.environ.get("EXCHANGERATE_API_KEY"))
+        results = converter.convert_many([(c.amount, c.from_currency, c.to_currency) for c in req.conversions])
+        return {"results": results}
+    except Exception as e:
+        return JSONResponse(status_code=502, content={"error": str(e)})
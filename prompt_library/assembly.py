@@ -0,0 +1,46 @@
+"""
+Prompt assembly for the agent.
+
+Providers cache the longest byte-identical prefix of a request (system prompt
+plus tool schemas). The assembler builds that prefix once per graph — a single
+system message and tools in a fixed order — and every agent turn reuses the
+same objects, so only the conversation tail changes between turns.
+"""
+from typing import List, Sequence
+
+from langchain_core.messages import SystemMessage
+
+from prompt_library.prompt import PROMPT_VARIANTS, STRUCTURED_OUTPUT_PROMPT
+from utils.config_loader import load_config
+
+
+def select_variant(model_name: str, prompts_config: dict = None) -> str:
+    """Pick the system prompt variant for a model from the `prompts` config section."""
+    if prompts_config is None:
+        prompts_config = load_config().get("prompts", {})
+    variant = prompts_config.get("variants", {}).get(model_name) or prompts_config.get("default_variant", "full")
+    if variant not in PROMPT_VARIANTS:
+        raise ValueError(f"Unknown prompt variant: {variant}")
+    return variant
+
+
+def stable_tool_order(tools: Sequence) -> List:
+    """Tools sorted by name so the bound schema list is identical on every run."""
+    def name_of(t):
+        return getattr(t, "name", None) or getattr(t, "__name__", "")
+    return sorted(tools, key=name_of)
+
+
+class PromptAssembler:
+    def __init__(self, model_name: str, structured_output: bool = False, variant: str = None):
+        self.variant = variant or select_variant(model_name)
+        content = PROMPT_VARIANTS[self.variant].content
+        if structured_output:
+            # one system message keeps the cacheable prefix contiguous
+            content = f"{content}\n\n{STRUCTURED_OUTPUT_PROMPT.content}"
+        self.system_message = SystemMessage(content=content)
+        self.prefix = (self.system_message,)
+
+    def assemble(self, messages: Sequence) -> List:
+        """Stable prefix followed by the conversation."""
+        return [*self.prefix, *messages]
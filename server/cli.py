@@ -0,0 +1,362 @@
+"""
+`voyagemate` command line entry point.
+
+    voyagemate serve --port 8000 --workers 4
+    voyagemate kb refresh --top 50 --every 3600
+
+`serve` is a small pre-fork server: the parent imports the FastAPI app,
+LangChain/LangGraph and the read-only state (config, caches) once, freezes
+the heap, then forks uvicorn workers that share all of it copy-on-write
+through one listening socket. Workers are pinned to CPU cores.
+
+Signals sent to the parent:
+- SIGTERM / SIGINT: workers stop accepting, drain in-flight requests and exit
+- SIGHUP: reload — the parent re-executes itself with the same socket,
+  preloads the new code, starts a new worker generation and, once every new
+  worker reports it is serving, asks the old workers to drain
+
+Workers that exit are respawned with exponential backoff; a worker that
+keeps failing before it is ready stops the server instead of looping.
+
+`kb` maintains the precomputed destination dossiers (utils/knowledge_base.py):
+`refresh` fetches the stale sections of the top destinations (once, or every
+N seconds), `show` prints what is stored for a place.
+"""
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger("voyagemate.server")
+
+LISTEN_FD_ENV = "VOYAGEMATE_LISTEN_FD"
+OLD_WORKERS_ENV = "VOYAGEMATE_OLD_WORKERS"
+
+
+def preload():
+    """Import the app and build shared read-only state before forking."""
+    import main
+    import agent.agentic_workflow  # noqa: F401  (LangChain / LangGraph imports)
+    from utils.cache import get_cache
+    from utils.llm_cache import get_llm_cache
+    from utils.knowledge_base import get_knowledge_base
+    from utils.config_loader import load_config
+
+    load_config()
+    get_cache()
+    get_llm_cache()
+    # dossiers are read-only in the workers: load them once and share the pages
+    get_knowledge_base()
+    # move everything allocated so far out of the GC's tracked generations,
+    # so collections in the workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def available_cpus() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _listen(host: str, port: int, backlog: int) -> socket.socket:
+    inherited = os.environ.pop(LISTEN_FD_ENV, None)
+    if inherited is not None:
+        sock = socket.socket(fileno=int(inherited))
+    else:
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker_server(config, ready_fd: int):
+    """uvicorn server that writes to `ready_fd` once startup (lifespan included) has finished."""
+    import uvicorn
+
+    class WorkerServer(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            if self.started:
+                os.write(ready_fd, b"1")
+            os.close(ready_fd)
+
+    return WorkerServer(config)
+
+
+class Arbiter:
+    # respawn delay doubles with each consecutive crash of a worker slot, up to the cap;
+    # a worker that stayed up for STABLE_AFTER seconds starts the count over
+    RESPAWN_DELAY = 0.5
+    RESPAWN_DELAY_MAX = 30.0
+    STABLE_AFTER = 60.0
+
+    def __init__(self, app, args):
+        self.app = app
+        self.args = args
+        self.cpus = available_cpus()
+        self.workers = {}  # pid -> worker index
+        self.started_at = {}  # pid -> monotonic spawn time
+        self.ready_fds = {}  # pid -> read end of the worker's readiness pipe, until it reports or dies
+        self.serving = set()  # pids that reported ready
+        self.crashes = {}  # worker index -> consecutive exits
+        self.boot_failures = {}  # worker index -> consecutive exits before ever serving
+        self.respawn_at = {}  # worker index -> monotonic time of the next spawn
+        self.stopping = False
+        self.reloading = False
+        self.exit_code = 0
+
+    def spawn(self, index: int, sock: socket.socket) -> int:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(write_fd)
+            self.workers[pid] = index
+            self.started_at[pid] = time.monotonic()
+            self.ready_fds[pid] = read_fd
+            return pid
+
+        # worker process
+        os.close(read_fd)
+        for fd in self.ready_fds.values():
+            os.close(fd)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        if self.args.pin and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {self.cpus[index % len(self.cpus)]})
+        import uvicorn
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            log_level=self.args.log_level,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            timeout_keep_alive=self.args.keep_alive,
+        )
+        try:
+            _worker_server(config, write_fd).run(sockets=[sock])
+        finally:
+            os._exit(0)
+
+    def _poll_ready(self, timeout: float = 0) -> None:
+        """Collect readiness reports; a pipe closed without one means the worker failed to start."""
+        if not self.ready_fds:
+            return
+        readable, _, _ = select.select(list(self.ready_fds.values()), [], [], timeout)
+        for pid, fd in list(self.ready_fds.items()):
+            if fd in readable:
+                if os.read(fd, 1) == b"1":
+                    self.serving.add(pid)
+                os.close(fd)
+                del self.ready_fds[pid]
+
+    def _wait_ready(self, pids, timeout: float) -> bool:
+        """Wait until every worker in `pids` has reported (or died); True if all of them are serving."""
+        deadline = time.monotonic() + timeout
+        while any(pid in self.ready_fds for pid in pids) and not self.stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._poll_ready(min(remaining, 0.5))
+        return all(pid in self.serving for pid in pids)
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        self.reloading = True
+
+    def _signal_all(self, pids, sig):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self, timeout: float = None):
+        """Collect exited workers; with a timeout, wait until none are left or time runs out."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                if deadline is None or time.monotonic() >= deadline:
+                    return
+                time.sleep(0.1)
+                continue
+            index = self.workers.pop(pid, None)
+            lived = time.monotonic() - self.started_at.pop(pid, time.monotonic())
+            fd = self.ready_fds.pop(pid, None)
+            if fd is not None:
+                # it may have reported ready just before exiting
+                if select.select([fd], [], [], 0)[0] and os.read(fd, 1) == b"1":
+                    self.serving.add(pid)
+                os.close(fd)
+            served = pid in self.serving
+            self.serving.discard(pid)
+            if index is None or self.stopping or deadline is not None:
+                continue
+            if lived >= self.STABLE_AFTER:
+                self.crashes[index] = 0
+            self.crashes[index] = self.crashes.get(index, 0) + 1
+            self.boot_failures[index] = 0 if served else self.boot_failures.get(index, 0) + 1
+            if self.boot_failures[index] >= self.args.max_boot_failures:
+                logger.error("Worker %s failed to start %d times in a row, shutting down", index, self.boot_failures[index])
+                self.exit_code = 1
+                self.stopping = True
+                continue
+            delay = min(self.RESPAWN_DELAY * 2 ** (self.crashes[index] - 1), self.RESPAWN_DELAY_MAX)
+            logger.warning("Worker %s (pid %s) exited, respawning in %.1fs", index, pid, delay)
+            self.respawn_at[index] = time.monotonic() + delay
+
+    def _respawn_due(self):
+        now = time.monotonic()
+        for index, at in list(self.respawn_at.items()):
+            if at <= now:
+                del self.respawn_at[index]
+                self.spawn(index, self.sock)
+
+    def _reexec(self):
+        """Reload: hand the socket and current workers to a freshly exec'd parent."""
+        logger.info("Reloading: re-executing with %d workers to drain", len(self.workers))
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        os.environ[OLD_WORKERS_ENV] = ",".join(str(pid) for pid in self.workers)
+        os.execv(sys.executable, [sys.executable, "-m", "server.cli", *sys.argv[1:]])
+
+    def run(self):
+        self.sock = _listen(self.args.host, self.args.port, self.args.backlog)
+        old_workers = [int(p) for p in os.environ.pop(OLD_WORKERS_ENV, "").split(",") if p]
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        new_workers = [self.spawn(index, self.sock) for index in range(self.args.workers)]
+        logger.info("Serving on %s:%s with %d workers", self.args.host, self.args.port, self.args.workers)
+
+        if old_workers:
+            # let the previous generation finish its requests and exit, but only once the new one serves
+            if self._wait_ready(new_workers, self.args.ready_timeout):
+                self._signal_all(old_workers, signal.SIGTERM)
+            else:
+                logger.error("New workers not ready after %ss; the previous generation (%s) keeps serving",
+                             self.args.ready_timeout, ",".join(map(str, old_workers)))
+
+        while not self.stopping:
+            if self.reloading:
+                self._reexec()
+            self._poll_ready()
+            self._reap()
+            self._respawn_due()
+            time.sleep(0.5)
+
+        logger.info("Shutting down, draining %d workers", len(self.workers))
+        self._signal_all(list(self.workers), signal.SIGTERM)
+        self._reap(timeout=self.args.graceful_timeout + 5)
+        self._signal_all(list(self.workers), signal.SIGKILL)
+        self.sock.close()
+        return self.exit_code
+
+
+def serve(args):
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    app = preload()
+    if not hasattr(os, "fork"):
+        # no fork (Windows): fall back to a single in-process server
+        import uvicorn
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+    sys.exit(Arbiter(app, args).run())
+
+
+def kb_refresh(args):
+    from utils.knowledge_base import KnowledgeBase, build_dossier_builder, default_destinations
+    from utils.config_loader import load_config
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(message)s")
+    cfg = load_config().get("knowledge_base", {}) or {}
+    kb = KnowledgeBase(args.path or cfg.get("path", "./data/knowledge_base.sqlite3"), max_age=cfg.get("max_age"))
+    builder = build_dossier_builder(kb)
+    names = list(dict.fromkeys(default_destinations(args.top) + (args.place or [])))
+    if not names:
+        raise SystemExit("No destinations: set knowledge_base.destinations in config.yaml or pass --place")
+    while True:
+        start = time.monotonic()
+        stats = builder.refresh(names, force=args.force, jobs=args.jobs)
+        logger.info("Refreshed %s in %.1fs: %s", kb.path, time.monotonic() - start, stats)
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+
+def kb_show(args):
+    import json
+    from utils.knowledge_base import KnowledgeBase
+    from utils.config_loader import load_config
+
+    cfg = load_config().get("knowledge_base", {}) or {}
+    kb = KnowledgeBase(args.path or cfg.get("path", "./data/knowledge_base.sqlite3"), max_age=cfg.get("max_age"))
+    kb.load()
+    for section in args.section or kb.max_age:
+        data = kb.lookup(args.place, section)
+        print(f"== {section}" + ("" if data else " (missing or stale)"))
+        if data:
+            print(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="voyagemate")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="run the API with preloaded, pre-forked workers")
+    p_serve.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    p_serve.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    p_serve.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 0)) or len(available_cpus()),
+                         help="number of worker processes (default: one per available core)")
+    p_serve.add_argument("--no-pin", dest="pin", action="store_false", help="do not pin workers to CPU cores")
+    p_serve.add_argument("--graceful-timeout", type=int, default=30, help="seconds to drain in-flight requests")
+    p_serve.add_argument("--keep-alive", type=int, default=5)
+    p_serve.add_argument("--backlog", type=int, default=2048)
+    p_serve.add_argument("--ready-timeout", type=int, default=60,
+                         help="seconds a reload waits for the new workers before draining the old ones")
+    p_serve.add_argument("--max-boot-failures", type=int, default=5,
+                         help="consecutive failed starts of a worker before the server gives up")
+    p_serve.add_argument("--log-level", default="info")
+    p_serve.set_defaults(func=serve)
+
+    p_kb = sub.add_parser("kb", help="maintain the precomputed destination knowledge base")
+    kb_sub = p_kb.add_subparsers(dest="kb_command", required=True)
+    p_refresh = kb_sub.add_parser("refresh", help="fetch stale dossier sections for the top destinations")
+    p_refresh.add_argument("--top", type=int, help="number of configured destinations to cover (default: knowledge_base.top_n)")
+    p_refresh.add_argument("--place", action="append", help="extra destination (repeatable)")
+    p_refresh.add_argument("--force", action="store_true", help="refetch every section, not only stale ones")
+    p_refresh.add_argument("--jobs", type=int, default=4, help="concurrent provider calls")
+    p_refresh.add_argument("--every", type=int, default=0, help="keep running, refreshing every N seconds")
+    p_refresh.add_argument("--path", help="SQLite file (default: knowledge_base.path)")
+    p_refresh.add_argument("--log-level", default="info")
+    p_refresh.set_defaults(func=kb_refresh)
+    p_show = kb_sub.add_parser("show", help="print the stored dossier of a place")
+    p_show.add_argument("place")
+    p_show.add_argument("--section", action="append")
+    p_show.add_argument("--path")
+    p_show.set_defaults(func=kb_show)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
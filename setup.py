@@ -33,5 +33,10 @@ setup(
     author="Mithilesh Iruvuri",
     author_email="mithileshiruvuri@gmail.com",
     packages = find_packages(),
-    install_requires=get_requirements()
+    package_data={"config": ["config.yaml"]},
+    py_modules=["main"],
+    install_requires=get_requirements(),
+    entry_points={
+        "console_scripts": ["voyagemate=server.cli:main"],
+    },
 )
\ No newline at end of file
@@ -1,91 +1,239 @@
 # streamlit_app.py (minimal, clean)
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
 import datetime
+import json
 import os
 
 BASE_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+PLAN_CACHE_SIZE = 32
 
 st.set_page_config(page_title="VoyageMate AI", layout="centered")
 st.title("🌍 VoyageMate AI")
 
 st.markdown("Enter where you'd like to go (e.g., 'Plan a trip to Gokarna for 5 days').")
 
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One pooled keep-alive session shared by all reruns and users of this server."""
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# response fields that belong to one user's conversation, never cached
+PRIVATE_FIELDS = ("session_id", "_meta")
+
+
+def get_plan_cache() -> OrderedDict:
+    """
+    Recent plan responses by normalized query (LRU). Kept per browser session:
+    a cache shared across users would hand out another user's plan.
+    """
+    if "plan_cache" not in st.session_state:
+        st.session_state.plan_cache = OrderedDict()
+    return st.session_state.plan_cache
+
+
+def _normalize(q: str) -> str:
+    return " ".join(q.lower().split())
+
+
+def cache_plan(q: str, data: dict):
+    """Cache a plan without its session (a later "Refine" must not continue an old conversation)."""
+    cache = get_plan_cache()
+    cache[_normalize(q)] = {k: v for k, v in data.items() if k not in PRIVATE_FIELDS}
+    cache.move_to_end(_normalize(q))
+    while len(cache) > PLAN_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def cached_plan(q: str):
+    cache = get_plan_cache()
+    data = cache.get(_normalize(q))
+    if data is not None:
+        cache.move_to_end(_normalize(q))
+    return data
+
+
+# ---- section renderers (each fills its own placeholder) ----
+
+def render_weather(box, data):
+    if data.get("weather"):
+        with box.container():
+            st.subheader("Weather")
+            st.markdown(data["weather"].replace("\n", "  \n"))
+
+
+def render_daily_weather(box, data):
+    days = data.get("daily_weather") or []
+    if days:
+        with box.container():
+            st.subheader("Daily forecast")
+            st.table([{"Date": d["date"], "Temp (°C)": f"{d['temp_min']}–{d['temp_max']}",
+                       "Conditions": d["description"], "Rain": f"{d['rain_chance']}%"} for d in days])
+
+
+def render_plan(box, data):
+    with box.container():
+        # DAY-BY-DAY prioritized
+        day_by_day = data.get("day_by_day", []) or []
+        if day_by_day:
+            st.subheader("Day-by-day itinerary")
+            for d in day_by_day:
+                title = d.get("day", "Day")
+                with st.expander(title, expanded=False):
+                    st.markdown(d.get("text", "").replace("\n", "  \n") or "—")
+        else:
+            # fallbacks to generic/offbeat plans
+            if data.get("generic_plan"):
+                st.subheader("Generic Tourist Plan")
+                st.markdown(data["generic_plan"].replace("\n", "  \n"))
+            if data.get("offbeat_plan"):
+                st.subheader("Off-Beat Plan")
+                st.markdown(data["offbeat_plan"].replace("\n", "  \n"))
+            if not data.get("generic_plan") and not data.get("offbeat_plan") and data.get("raw"):
+                # finally show raw
+                st.subheader("Full Plan (raw)")
+                st.markdown(data.get("raw", "").replace("\n", "  \n"))
+
+
+def render_costs(box, data):
+    # Cost summary (if available)
+    costs = data.get("costs", {}) or {}
+    if costs:
+        with box.container():
+            st.subheader("Cost summary")
+            total = costs.get("Total") or sum(v for v in costs.values())
+            st.write(f"**Estimated total:** ₹{total:,}")
+            with st.expander("Cost breakdown"):
+                for k, v in costs.items():
+                    st.write(f"- {k}: ₹{v:,}")
+
+
+def render_extras(box, data):
+    with box.container():
+        # Tools used (debug) collapsed
+        tools = data.get("tools_used", []) or []
+        if tools:
+            with st.expander("Tools used (debug)", expanded=False):
+                st.write(", ".join(tools))
+
+        # raw download
+        with st.expander("Full raw text", expanded=False):
+            st.code(data.get("raw", ""), language="text")
+        st.download_button("Download itinerary (TXT)", data=data.get("raw", ""), file_name="itinerary.txt",
+                           mime="text/plain", key=f"download-{hash(data.get('raw', ''))}")
+
+
+# sections -> renderer; a renderer runs again whenever one of its sections arrives
+RENDERERS = [
+    (("weather",), render_weather),
+    (("daily_weather",), render_daily_weather),
+    (("day_by_day", "generic_plan", "offbeat_plan", "raw"), render_plan),
+    (("costs",), render_costs),
+    (("tools_used", "raw"), render_extras),
+]
+
+
+def render_header(q: str, generated: str):
+    st.header("Itinerary")
+    st.write(f"**Generated:** {generated}")
+    st.write(f"**Query:** {q}")
+    st.markdown("---")
+
+
+def render_all(data: dict):
+    for _, renderer in RENDERERS:
+        renderer(st.empty(), data)
+
+
+def stream_plan(q: str, session_id: str = None) -> dict:
+    """Consume /query/stream, rendering each section as soon as it arrives."""
+    status = st.status("Generating itinerary...", expanded=False)
+    boxes = [st.empty() for _ in RENDERERS]
+    data = {}
+    payload = {"question": q}
+    if session_id:
+        payload["session_id"] = session_id
+    with get_http_session().post(f"{BASE_URL}/query/stream", json=payload, stream=True, timeout=(5, 120)) as resp:
+        if resp.status_code != 200:
+            status.update(label="Failed", state="error")
+            raise RuntimeError(f"Backend error ({resp.status_code}): {resp.text}")
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            kind = event.get("event")
+            if kind == "status":
+                status.write(event["message"])
+            elif kind == "section":
+                data[event["name"]] = event["data"]
+                for (names, renderer), box in zip(RENDERERS, boxes):
+                    if event["name"] in names:
+                        renderer(box, data)
+            elif kind == "done":
+                data["session_id"] = event.get("session_id")
+            elif kind == "error":
+                status.update(label="Failed", state="error")
+                raise RuntimeError(event.get("error"))
+    status.update(label="Itinerary ready", state="complete")
+    return data
+
+
 if "history" not in st.session_state:
     st.session_state.history = []
+if "selected" not in st.session_state:
+    st.session_state.selected = None
 
 with st.form("plan_form", clear_on_submit=True):
     q = st.text_input("Plan request", placeholder="e.g. Goa, 5 days")
+    refine = st.checkbox("Refine the last plan (e.g. 'make day 3 cheaper')",
+                         disabled=not st.session_state.history)
     submit = st.form_submit_button("Generate Plan")
 
 if submit and q.strip():
-    st.session_state.history.append({"q": q, "time": datetime.datetime.now().isoformat()})
-    with st.spinner("Generating itinerary..."):
-        try:
-            resp = requests.post(f"{BASE_URL}/query", json={"question": q}, timeout=60)
-            if resp.status_code != 200:
-                st.error(f"Backend error ({resp.status_code}): {resp.text}")
-            else:
-                data = resp.json()
-
-                st.header("Itinerary")
-                st.write(f"**Generated:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-                st.write(f"**Query:** {q}")
-                st.markdown("---")
-
-                # WEATHER first, as a separate block (if present)
-                if data.get("weather"):
-                    st.subheader("Weather")
-                    st.markdown(data["weather"].replace("\n", "  \n"))
-
-                # DAY-BY-DAY prioritized
-                day_by_day = data.get("day_by_day", []) or []
-                if day_by_day:
-                    st.subheader("Day-by-day itinerary")
-                    for d in day_by_day:
-                        title = d.get("day", "Day")
-                        with st.expander(title, expanded=False):
-                            st.markdown(d.get("text", "").replace("\n", "  \n") or "—")
-                else:
-                    # fallbacks to generic/offbeat plans
-                    if data.get("generic_plan"):
-                        st.subheader("Generic Tourist Plan")
-                        st.markdown(data["generic_plan"].replace("\n", "  \n"))
-                    if data.get("offbeat_plan"):
-                        st.subheader("Off-Beat Plan")
-                        st.markdown(data["offbeat_plan"].replace("\n", "  \n"))
-                    if not data.get("generic_plan") and not data.get("offbeat_plan"):
-                        # finally show raw
-                        st.subheader("Full Plan (raw)")
-                        st.markdown(data.get("raw", "").replace("\n", "  \n"))
-
-                # Cost summary (if available)
-                costs = data.get("costs", {}) or {}
-                if costs:
-                    st.subheader("Cost summary")
-                    total = costs.get("Total") or sum(v for v in costs.values())
-                    st.write(f"**Estimated total:** ₹{total:,}")
-                    with st.expander("Cost breakdown"):
-                        for k, v in costs.items():
-                            st.write(f"- {k}: ₹{v:,}")
-
-                # Tools used (debug) collapsed
-                tools = data.get("tools_used", []) or []
-                if tools:
-                    with st.expander("Tools used (debug)", expanded=False):
-                        st.write(", ".join(tools))
-
-                # raw download
-                with st.expander("Full raw text", expanded=False):
-                    st.code(data.get("raw", ""), language="text")
-                st.download_button("Download itinerary (TXT)", data=data.get("raw",""), file_name="itinerary.txt", mime="text/plain")
-
-        except Exception as e:
-            st.error(f"Failed to get plan: {e}")
+    st.session_state.selected = None
+    now = datetime.datetime.now()
+    session_id = st.session_state.history[-1]["data"].get("session_id") if refine and st.session_state.history else None
+    render_header(q, now.strftime('%Y-%m-%d %H:%M'))
+    try:
+        data = None if session_id else cached_plan(q)
+        if data is not None:
+            st.caption("Served from recent plans")
+            # "Refine" continues this user's own conversation for the query, if there is one
+            own = next((h["data"]["session_id"] for h in reversed(st.session_state.history)
+                        if _normalize(h["q"]) == _normalize(q) and h["data"].get("session_id")), None)
+            data = {**data, "session_id": own} if own else data
+            render_all(data)
+        else:
+            data = stream_plan(q, session_id)
+            if not session_id:
+                cache_plan(q, data)
+        st.session_state.history.append({"q": q, "time": now.isoformat(), "data": data})
+    except Exception as e:
+        st.error(f"Failed to get plan: {e}")
+elif st.session_state.selected is not None:
+    # re-open a past itinerary without calling the backend
+    item = st.session_state.history[st.session_state.selected]
+    render_header(item["q"], item["time"])
+    render_all(item["data"])
 
 # simple recent history UI
 if st.session_state.history:
     st.markdown("---")
     st.subheader("Recent requests")
-    for item in reversed(st.session_state.history[-6:]):
-        st.write(f"- {item['q']} ({item['time']})")
+    for i in reversed(range(max(0, len(st.session_state.history) - 6), len(st.session_state.history))):
+        item = st.session_state.history[i]
+        col_q, col_open = st.columns([5, 1])
+        col_q.write(f"- {item['q']} ({item['time']})")
+        if col_open.button("Open", key=f"open-{i}"):
+            st.session_state.selected = i
+            st.rerun()
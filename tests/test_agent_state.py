@@ -0,0 +1,121 @@
+"""
+The shared compiled graph (agent_state.compact) with concurrent requests, each
+in its own quota context. The LLM is a local fake; tools run for real.
+
+    python -m unittest discover tests
+"""
+import os
+import threading
+import unittest
+
+for _key in ("GROQ_API_KEY", "FOURSQUARE_API_KEY", "OPENWEATHER_API_KEY", "EXCHANGERATE_API_KEY", "TAVILY_API_KEY"):
+    os.environ.setdefault(_key, "test")
+os.environ["VOYAGEMATE_COMPACT_STATE"] = "1"
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import utils.cache
+import utils.llm_cache
+import utils.model_loader
+from agent import agentic_workflow
+from utils.agent_state import get_tool_output_table
+from utils.quota import begin_request, get_quota_manager
+
+
+class _FakeLLM(BaseChatModel):
+    """Calls the budget tool once, then answers with the question; tokens = question length."""
+
+    model_name: str = "fake-model"
+    temperature: float = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        question = next(m.content for m in messages if m.type == "human")
+        if messages[-1].type == "human":
+            sheet = {"days": 2, "hotels": [{"price_per_night": 1000, "nights": 2}]}
+            message = AIMessage(content="", tool_calls=[{"name": "calculate_trip_budget", "args": {"cost_sheet": sheet},
+                                                         "id": "budget"}])
+        else:
+            message = AIMessage(content=f"Plan for {question}")
+        message.usage_metadata = {"input_tokens": len(question), "output_tokens": 1, "total_tokens": len(question) + 1}
+        message.response_metadata = {"model_name": self.model_name, "system_fingerprint": "fp", "logprobs": None}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class SharedGraphTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._load_llm = utils.model_loader.ModelLoader.load_llm
+        utils.model_loader.ModelLoader.load_llm = lambda self, *args, **kwargs: _FakeLLM()
+        # every call reaches the fake model and no budget cuts the run short
+        utils.cache._cache, utils.cache._cache_loaded = None, True
+        utils.llm_cache._llm_cache, utils.llm_cache._llm_cache_loaded = None, True
+        cls._budgets = get_quota_manager().budgets
+        get_quota_manager().budgets = {}
+        agentic_workflow._graphs.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        utils.model_loader.ModelLoader.load_llm = cls._load_llm
+        get_quota_manager().budgets = cls._budgets
+        agentic_workflow._graphs.clear()
+
+    def test_one_graph_per_mode(self):
+        graph = agentic_workflow.get_graph("groq")
+        self.assertIs(agentic_workflow.get_graph("groq"), graph)
+        self.assertIsNot(agentic_workflow.get_graph("groq", structured_output=True), graph)
+
+    def test_concurrent_requests_keep_their_own_state_and_usage(self):
+        graph = agentic_workflow.get_graph("groq")
+        questions = {f"tenant-{i}": f"Trip {i} to {'Goa' * (i + 1)}" for i in range(8)}
+        barrier = threading.Barrier(len(questions))
+        results, errors = {}, []
+
+        def plan(tenant, question):
+            try:
+                usage = begin_request(tenant)
+                barrier.wait()
+                output = graph.invoke({"messages": [HumanMessage(content=question)]})
+                results[tenant] = (output["messages"], usage.summary())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=plan, args=item) for item in questions.items()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        for tenant, question in questions.items():
+            messages, usage = results[tenant]
+            self.assertEqual(messages[0].content, question)
+            self.assertEqual(messages[-1].content, f"Plan for {question}")
+            self.assertEqual(usage["tenant"], tenant)
+            # two LLM turns, each charged with this request's own token count
+            self.assertEqual(usage["provider_calls"], {"groq": 2})
+            self.assertEqual(usage["llm"]["input_tokens"], 2 * len(question))
+
+    def test_state_is_compact(self):
+        output = agentic_workflow.get_graph("groq").invoke({"messages": [HumanMessage(content="Trip to Gokarna")]})
+        calls = [m for m in output["messages"] if isinstance(m, AIMessage)]
+        for m in calls:
+            self.assertEqual(m.response_metadata, {"model_name": "fake-model"})
+            self.assertEqual(m.usage_metadata["input_tokens"], len("Trip to Gokarna"))
+        tool_output = next(m for m in output["messages"] if isinstance(m, ToolMessage))
+        self.assertGreaterEqual(len(tool_output.content), get_tool_output_table().min_length)
+        # an equal result in another run is the same string object
+        again = agentic_workflow.get_graph("groq").invoke({"messages": [HumanMessage(content="Trip to Gokarna")]})
+        self.assertIs(next(m for m in again["messages"] if isinstance(m, ToolMessage)).content, tool_output.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
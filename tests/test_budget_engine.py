@@ -0,0 +1,60 @@
+"""
+Trip budget computation (utils/budget_engine.py).
+
+    python -m unittest discover tests
+"""
+import unittest
+
+from utils.budget_engine import Activity, BudgetEngine, CostSheet, HotelStay, MealPlan, TransportLeg
+
+
+def compute(**sheet) -> dict:
+    return BudgetEngine().compute(CostSheet(**{"days": 3, **sheet}))
+
+
+class BudgetEngineTest(unittest.TestCase):
+    def test_items_inside_the_trip(self):
+        result = compute(travelers=2,
+                         hotels=[HotelStay(price_per_night=1000, nights=2)],
+                         meals=[MealPlan(cost_per_person_per_day=300)],
+                         transport=[TransportLeg(cost=600, day=1), TransportLeg(cost=300)],
+                         activities=[Activity(cost_per_person=250, day=3)])
+        self.assertEqual(result["per_category"], {"hotel": 2000, "food": 1800, "transport": 900, "activities": 500})
+        self.assertEqual(result["total"], 5200)
+        self.assertEqual([d["amount"] for d in result["per_day"]], [2300, 1700, 1200])
+        self.assertNotIn("warnings", result)
+
+    def test_hotel_nights_outside_the_trip_are_not_charged(self):
+        result = compute(hotels=[HotelStay(name="Zostel", price_per_night=1000, nights=4, start_day=2)])
+        self.assertEqual(result["per_category"]["hotel"], 2000)
+        self.assertEqual([d["amount"] for d in result["per_day"]], [0, 1000, 1000])
+        self.assertEqual(result["warnings"], ["Zostel: 2 of 4 nights fall outside the 3-day trip and were not counted"])
+
+    def test_meal_days_beyond_the_trip_are_not_charged(self):
+        result = compute(travelers=2, meals=[MealPlan(cost_per_person_per_day=300, days=5)])
+        self.assertEqual(result["per_category"]["food"], 1800)
+        self.assertEqual([d["amount"] for d in result["per_day"]], [600, 600, 600])
+        self.assertEqual(result["warnings"], ["Meals: 2 of 5 days fall outside the 3-day trip and were not counted"])
+
+    def test_transport_outside_the_trip_is_not_charged(self):
+        result = compute(transport=[TransportLeg(description="Return bus", cost=900, day=4),
+                                    TransportLeg(description="Ferry", cost=100, day=0),
+                                    TransportLeg(cost=300, day=2)])
+        self.assertEqual(result["per_category"]["transport"], 300)
+        self.assertEqual([d["amount"] for d in result["per_day"]], [0, 300, 0])
+        self.assertEqual(result["warnings"], ["Return bus: day 4 falls outside the 3-day trip and was not counted",
+                                              "Ferry: day 0 falls outside the 3-day trip and was not counted"])
+
+    def test_activities_outside_the_trip_are_not_charged(self):
+        result = compute(travelers=2, activities=[Activity(name="Scuba", cost_per_person=3000, day=7),
+                                                  Activity(cost_per_person=100)])
+        self.assertEqual(result["per_category"]["activities"], 200)
+        self.assertEqual(result["warnings"], ["Scuba: day 7 falls outside the 3-day trip and was not counted"])
+
+    def test_foreign_currency_needs_a_converter(self):
+        with self.assertRaises(ValueError):
+            compute(activities=[Activity(cost_per_person=10, currency="USD")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+TieredCache and RedisBackend against the local stand-in server (utils/cache_server.py).
+
+    python -m unittest discover tests
+"""
+import socket
+import time
+import unittest
+
+import utils.cache
+from utils.cache import LRUCache, RedisBackend, TieredCache, cached, dumps, loads
+from utils.cache_server import CacheServer
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class CacheServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = CacheServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        with self.server.store.lock:
+            self.server.store.data.clear()
+        self.backend = RedisBackend(self.server.url)
+
+    def tearDown(self):
+        self.backend.close()
+
+    def cache(self, **kwargs) -> TieredCache:
+        """A cache with a cold L1 over the shared server, like a fresh worker."""
+        return TieredCache(LRUCache(16), self.backend, **kwargs)
+
+
+class RedisBackendTest(CacheServerTestCase):
+    def test_get_set_delete(self):
+        self.assertIsNone(self.backend.get("k"))
+        self.backend.set("k", b"\x00value\r\n")
+        self.assertEqual(self.backend.get("k"), b"\x00value\r\n")
+        self.backend.delete("k")
+        self.assertIsNone(self.backend.get("k"))
+
+    def test_ttl(self):
+        self.backend.set("k", b"v", ttl=0.05)
+        self.assertEqual(self.backend.get("k"), b"v")
+        time.sleep(0.1)
+        self.assertIsNone(self.backend.get("k"))
+
+
+class TieredCacheTest(CacheServerTestCase):
+    def test_miss_then_hit(self):
+        cache = self.cache()
+        self.assertIsNone(cache.get("places", "gokarna"))
+        self.assertEqual(cache.get("places", "gokarna", "default"), "default")
+        cache.set("places", "gokarna", {"results": [{"name": "Om Beach"}]})
+        self.assertEqual(cache.get("places", "gokarna"), {"results": [{"name": "Om Beach"}]})
+
+    def test_hit_from_l2_in_another_worker(self):
+        self.cache().set("places", "gokarna", {"results": ["x" * 4096]})  # compressed on the way to L2
+        other = self.cache()
+        self.assertEqual(other.get("places", "gokarna"), {"results": ["x" * 4096]})
+        # promoted into the reader's L1
+        self.assertEqual(len(other.l1), 1)
+
+    def test_ttl_from_namespace_defaults(self):
+        self.cache(default_ttls={"weather": 0.05}).set("weather", "gokarna", {"temp": 31})
+        time.sleep(0.1)
+        self.assertIsNone(self.cache().get("weather", "gokarna"))
+
+    def test_explicit_ttl_overrides_default(self):
+        self.cache(default_ttls={"weather": 0.05}).set("weather", "gokarna", {"temp": 31}, ttl=60)
+        time.sleep(0.1)
+        self.assertEqual(self.cache().get("weather", "gokarna"), {"temp": 31})
+
+    def test_corrupt_blob_is_a_miss(self):
+        cache = self.cache()
+        self.backend.set(cache._key("places", "gokarna"), b"\x03not msgpack or zlib")
+        with self.assertLogs("utils.cache", "WARNING"):
+            self.assertEqual(cache.get("places", "gokarna", "default"), "default")
+        cache.set("places", "gokarna", {"results": []})
+        self.assertEqual(self.cache().get("places", "gokarna"), {"results": []})
+
+    def test_l2_down_falls_back_to_l1(self):
+        cache = TieredCache(LRUCache(16), RedisBackend(f"redis://127.0.0.1:{_free_port()}/0", timeout=0.2))
+        with self.assertLogs("utils.cache", "WARNING"):
+            self.assertIsNone(cache.get("places", "gokarna"))
+        with self.assertLogs("utils.cache", "WARNING"):
+            cache.set("places", "gokarna", {"results": []})
+        self.assertEqual(cache.get("places", "gokarna"), {"results": []})
+
+    def test_l2_lost_mid_run(self):
+        cache = self.cache()
+        cache.set("places", "gokarna", {"results": []})
+        self.backend.close()
+        broken = RedisBackend(f"redis://127.0.0.1:{_free_port()}/0", timeout=0.2)
+        cache.l2 = broken
+        self.assertEqual(cache.get("places", "gokarna"), {"results": []})
+        with self.assertLogs("utils.cache", "WARNING"):
+            self.assertIsNone(cache.get("places", "bangalore"))
+
+
+class _Wrapper:
+    calls = []  # on the class: instance attributes are part of the cache key
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    @cached("places")
+    def search(self, place: str):
+        self.calls.append(place)
+        return {"results": [f"{place} via {self.api_key}"]}
+
+
+class CachedDecoratorTest(unittest.TestCase):
+    def setUp(self):
+        self._saved = utils.cache._cache, utils.cache._cache_loaded
+        utils.cache._cache, utils.cache._cache_loaded = TieredCache(LRUCache(16)), True
+        _Wrapper.calls.clear()
+
+    def tearDown(self):
+        utils.cache._cache, utils.cache._cache_loaded = self._saved
+
+    def test_differently_configured_instances_do_not_share(self):
+        self.assertEqual(_Wrapper("key-a").search("Gokarna"), {"results": ["Gokarna via key-a"]})
+        self.assertEqual(_Wrapper("key-b").search("Gokarna"), {"results": ["Gokarna via key-b"]})
+
+    def test_equally_configured_instances_share(self):
+        _Wrapper("key-a").search("Gokarna")
+        _Wrapper("key-a").search("Gokarna")
+        self.assertEqual(_Wrapper.calls, ["Gokarna"])
+
+    def test_mutating_a_result_does_not_change_the_cache(self):
+        wrapper = _Wrapper("key-a")
+        wrapper.search("Gokarna")["results"].append("mutated")
+        wrapper.search("Gokarna")["results"].clear()
+        self.assertEqual(wrapper.search("Gokarna"), {"results": ["Gokarna via key-a"]})
+        self.assertEqual(_Wrapper.calls, ["Gokarna"])
+
+
+class SerializationTest(unittest.TestCase):
+    def test_round_trip(self):
+        for value in ({"a": [1, 2.5, None, True]}, "x" * 5000, []):
+            self.assertEqual(loads(dumps(value)), value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Background plan exports (utils/save_to_document.py).
+
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import time
+import unittest
+
+from utils.save_to_document import DocumentExporter, render_html
+
+
+class RenderHtmlTest(unittest.TestCase):
+    def test_cost_values_of_any_type(self):
+        page = render_html({"costs": {"Hotel": 6000, "Ferry": 1250.5, "Food": "₹1,200", "Visa": "N/A", "Tips": None}})
+        for cell in ("<td>₹6,000</td>", "<td>₹1,250.50</td>", "<td>₹1,200</td>", "<td>N/A</td>", "<td>None</td>"):
+            self.assertIn(cell, page)
+
+    def test_currency_from_plan_then_default(self):
+        self.assertIn("<td>$6,000</td>", render_html({"costs": {"Hotel": 6000}, "currency": "USD"}, "INR"))
+        self.assertIn("<td>€6,000</td>", render_html({"costs": {"Hotel": 6000}}, "EUR"))
+        self.assertIn("<td>THB 6,000</td>", render_html({"costs": {"Hotel": 6000}}, "THB"))
+
+
+class _FailingExporter(DocumentExporter):
+    def _render(self, sections, fmt):
+        raise ValueError("cannot render")
+
+
+class DocumentExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def wait(self, exporter, name):
+        deadline = time.time() + 5
+        while exporter.is_pending(name) and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_export_is_written(self):
+        exporter = DocumentExporter(self.dir.name)
+        name = exporter.submit({"raw": "Day 1", "costs": {"Food": "N/A"}}, ["html"])["html"]
+        self.wait(exporter, name)
+        self.assertTrue(os.path.isfile(exporter.path_for(name)))
+        self.assertIsNone(exporter.error_for(name))
+        exporter.shutdown()
+
+    def test_failed_export_is_reported_and_retried(self):
+        exporter = _FailingExporter(self.dir.name)
+        sections = {"raw": "Day 1"}
+        name = exporter.submit(sections, ["html"])["html"]
+        self.wait(exporter, name)
+        self.assertIsNone(exporter.path_for(name))
+        self.assertEqual(exporter.error_for(name), "ValueError: cannot render")
+        # submitting again clears the error and tries once more
+        exporter.__class__ = DocumentExporter
+        exporter.submit(sections, ["html"])
+        self.wait(exporter, name)
+        self.assertIsNone(exporter.error_for(name))
+        self.assertIsNotNone(exporter.path_for(name))
+        exporter.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Dossier lookups by place name (utils/knowledge_base.py).
+
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+
+from utils.knowledge_base import KnowledgeBase, place_key
+
+PARIS = {"source": "foursquare", "items": [{"name": "Louvre", "category": "Museum", "address": "Paris"}]}
+GOKARNA = {"source": "foursquare", "items": [{"name": "Om Beach", "category": "Beach", "address": "Gokarna"}]}
+PARIS_GEOCODE = {"display_name": "Paris, France", "lat": "48.85", "lon": "2.35"}
+
+
+class KnowledgeBaseLookupTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.kb = KnowledgeBase(os.path.join(self.dir.name, "kb.sqlite3"),
+                                aliases={"Gokarna, Karnataka": "Gokarna"})
+        conn = self.kb.connect()
+        self.kb.put(conn, "Paris", "attractions", PARIS)
+        self.kb.put(conn, "Paris", "geocode", PARIS_GEOCODE)
+        self.kb.put(conn, "Gokarna", "attractions", GOKARNA)
+        self.kb.bump_generation(conn)
+        conn.commit()
+        conn.close()
+        self.kb.load()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_place_key_normalizes_spacing_and_case(self):
+        self.assertEqual(place_key("  Gokarna, "), "gokarna")
+        self.assertEqual(place_key("Paris,  Texas"), "paris, texas")
+
+    def test_same_name_hits(self):
+        self.assertEqual(self.kb.lookup("paris ", "attractions"), PARIS)
+
+    def test_other_city_with_the_same_first_name_misses(self):
+        self.assertIsNone(self.kb.lookup("Paris, Texas", "attractions"))
+        self.assertIsNone(self.kb.lookup("Paris, Texas", "geocode"))
+        self.assertIsNone(self.kb.lookup("London, Ontario", "attractions"))
+
+    def test_configured_alias_hits(self):
+        self.assertEqual(self.kb.lookup("Gokarna, Karnataka", "attractions"), GOKARNA)
+        self.assertIsNone(self.kb.lookup("Gokarna, Texas", "attractions"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Bounds on the tool-selection router of the tiered graph (agent/agentic_workflow.py).
+The models are local fakes; the budget tool runs for real.
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+
+for _key in ("GROQ_API_KEY", "FOURSQUARE_API_KEY", "OPENWEATHER_API_KEY", "EXCHANGERATE_API_KEY", "TAVILY_API_KEY"):
+    os.environ.setdefault(_key, "test")
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import utils.cache
+import utils.llm_cache
+import utils.model_loader
+from agent.agentic_workflow import MAX_ROUTER_TURNS, GraphBuilder
+from utils.itinerary import ITINERARY_TOOL_NAME
+from utils.quota import get_quota_manager
+
+ROUTING = "routing-model"
+CALLS = []      # model names, in the order the graph called them
+ROUTE = [None]  # n -> tool calls the router makes on its n-th call
+
+
+class _FakeLLM(BaseChatModel):
+    """The router answers with ROUTE on each call; the main model writes the plan."""
+
+    model_name: str = "main-model"
+    temperature: float = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        CALLS.append(self.model_name)
+        if self.model_name == ROUTING:
+            tool_calls = ROUTE[0](CALLS.count(ROUTING))
+            message = AIMessage(content="", tool_calls=tool_calls)
+        else:
+            message = AIMessage(content="Day 1: Beach")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _budget_call(n: int, days: int = 2) -> list:
+    return [{"name": "calculate_trip_budget", "args": {"cost_sheet": {"days": days}}, "id": f"budget-{n}"}]
+
+
+class RouterBoundsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._load_llm = utils.model_loader.ModelLoader.load_llm
+        utils.model_loader.ModelLoader.load_llm = \
+            lambda self, model_name=None, **kwargs: _FakeLLM(model_name=ROUTING if kwargs.get("max_tokens") else "main-model")
+        utils.cache._cache, utils.cache._cache_loaded = None, True
+        utils.llm_cache._llm_cache, utils.llm_cache._llm_cache_loaded = None, True
+        cls._budgets = get_quota_manager().budgets
+        get_quota_manager().budgets = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        utils.model_loader.ModelLoader.load_llm = cls._load_llm
+        get_quota_manager().budgets = cls._budgets
+
+    def setUp(self):
+        CALLS.clear()
+
+    def run_graph(self, route, structured_output: bool = False) -> list:
+        ROUTE[0] = route
+        graph = GraphBuilder(structured_output=structured_output, tiering=True)()
+        return graph.invoke({"messages": [HumanMessage(content="Gokarna, 2 days")]}, {"recursion_limit": 100})["messages"]
+
+    def test_repeated_call_escalates(self):
+        messages = self.run_graph(lambda n: _budget_call(n))
+        self.assertEqual(CALLS, [ROUTING, ROUTING, "main-model"])
+        self.assertEqual(sum(isinstance(m, ToolMessage) for m in messages), 1)
+        self.assertEqual(messages[-1].content, "Day 1: Beach")
+
+    def test_router_turns_are_capped(self):
+        messages = self.run_graph(lambda n: _budget_call(n, days=n + 1))
+        self.assertEqual(CALLS, [ROUTING] * MAX_ROUTER_TURNS + ["main-model"])
+        self.assertEqual(sum(isinstance(m, ToolMessage) for m in messages), MAX_ROUTER_TURNS)
+        self.assertEqual(messages[-1].content, "Day 1: Beach")
+
+    def test_calls_to_unbound_tools_are_dropped(self):
+        def route(n):
+            itinerary = {"name": ITINERARY_TOOL_NAME, "args": {"destination": "Gokarna"}, "id": f"it-{n}"}
+            return [itinerary] + (_budget_call(n) if n == 1 else [])
+
+        messages = self.run_graph(route, structured_output=True)
+        self.assertEqual(CALLS, [ROUTING, ROUTING, "main-model"])
+        routed = [tc["name"] for m in messages if isinstance(m, AIMessage) for tc in m.tool_calls]
+        self.assertEqual(routed, ["calculate_trip_budget"])
+        self.assertEqual(messages[-1].content, "Day 1: Beach")
+
+
+if __name__ == "__main__":
+    unittest.main()
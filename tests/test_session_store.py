@@ -0,0 +1,105 @@
+"""
+Session storage and re-plan merging (utils/session_store.py).
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+
+for _key in ("GROQ_API_KEY", "FOURSQUARE_API_KEY", "OPENWEATHER_API_KEY", "EXCHANGERATE_API_KEY", "TAVILY_API_KEY"):
+    os.environ.setdefault(_key, "test")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from main import split_sections
+from utils.session_store import SessionStore, merge_sections
+
+PLAN = """Five relaxed days in Gokarna, between beaches and temples.
+Generic Tourist Plan
+Day 1: Arrival
+Om Beach and sunset
+Day 2: Temples
+Mahabaleshwar Temple
+Day 3: Beaches
+Kudle Beach, Half Moon Beach by boat
+Off-Beat Plan
+Day 1: Caves
+Yana Caves
+Day 3: Trek
+Beach trek to Paradise Beach
+Cost Breakdown
+Hotel: ₹6,000
+Activities: ₹3,000
+Total: ₹9,000
+"""
+
+
+class MergeSectionsTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = split_sections(PLAN)
+
+    def days(self, merged, plan):
+        return {d["day"]: d["text"] for d in merged["day_by_day"] if d["plan"] == plan}
+
+    def test_partial_replan_keeps_everything_it_leaves_out(self):
+        reply = "Here is a cheaper day 3.\nGeneric Tourist Plan\nDay 3: Beaches\nKudle Beach on foot\n"
+        merged = merge_sections(self.previous, split_sections(reply))
+        self.assertEqual(merged["intro"], self.previous["intro"])
+        self.assertEqual(merged["attractions_list"][:len(self.previous["attractions_list"])],
+                         self.previous["attractions_list"])
+        self.assertEqual(merged["offbeat_plan"], self.previous["offbeat_plan"])
+        self.assertEqual(merged["cost_breakdown_text"], self.previous["cost_breakdown_text"])
+        generic = self.days(merged, "generic")
+        self.assertEqual(generic["Day 1: Arrival"], "Om Beach and sunset")
+        self.assertEqual(generic["Day 3: Beaches"], "Kudle Beach on foot")
+        self.assertIn("Mahabaleshwar Temple", merged["generic_plan"])
+        self.assertIn("Kudle Beach on foot", merged["generic_plan"])
+        self.assertNotIn("by boat", merged["generic_plan"])
+        self.assertIn("generic_plan", merged["updated_sections"])
+        self.assertNotIn("intro", merged["updated_sections"])
+
+    def test_generic_and_offbeat_days_merge_separately(self):
+        reply = "Off-Beat Plan\nDay 1: Caves\nYana Caves at dawn\n"
+        merged = merge_sections(self.previous, split_sections(reply))
+        self.assertEqual(self.days(merged, "generic")["Day 1: Arrival"], "Om Beach and sunset")
+        self.assertEqual(self.days(merged, "offbeat")["Day 1: Caves"], "Yana Caves at dawn")
+        self.assertEqual(len(merged["day_by_day"]), len(self.previous["day_by_day"]))
+
+    def test_day_without_plan_heading_updates_the_plan_that_has_it(self):
+        merged = merge_sections(self.previous, split_sections("Day 2: Temples\nMurudeshwar instead\n"))
+        self.assertEqual(self.days(merged, "generic")["Day 2: Temples"], "Murudeshwar instead")
+        self.assertIn("Murudeshwar instead", merged["generic_plan"])
+        self.assertEqual(self.days(merged, "offbeat"), self.days(self.previous, "offbeat"))
+
+    def test_cost_lines_merge_by_label(self):
+        reply = "Cost Breakdown\nActivities: ₹1,500\nTotal: ₹7,500\n"
+        merged = merge_sections(self.previous, split_sections(reply))
+        self.assertIn("Hotel: ₹6,000", merged["cost_breakdown_text"])
+        self.assertIn("Activities: ₹1,500", merged["cost_breakdown_text"])
+        self.assertNotIn("₹3,000", merged["cost_breakdown_text"])
+        self.assertEqual(merged["costs"]["Hotel:"], 6000)
+        self.assertEqual(merged["costs"]["Total"], 7500)
+
+    def test_raw_keeps_the_full_plan(self):
+        merged = merge_sections(self.previous, split_sections("Day 2: Temples\nMurudeshwar instead\n"))
+        self.assertTrue(merged["raw"].startswith(PLAN.rstrip()))
+        self.assertTrue(merged["raw"].endswith("Murudeshwar instead"))
+
+
+class SessionStoreTest(unittest.TestCase):
+    def test_round_trip(self):
+        store = SessionStore()
+        store.save("s", [HumanMessage(content="Gokarna"), AIMessage(content="plan")], {"raw": "plan"})
+        messages, sections = store.load("s")
+        self.assertEqual([m.content for m in messages], ["Gokarna", "plan"])
+        self.assertEqual(sections, {"raw": "plan"})
+
+    def test_unreadable_blob_is_a_miss(self):
+        store = SessionStore()
+        store.l1.set(store._key("truncated"), b"\x03not a session")
+        with self.assertLogs("utils.session_store", "WARNING"):
+            self.assertIsNone(store.load("truncated"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Coalescing of identical concurrent calls (utils/single_flight.py).
+
+    python -m unittest discover tests
+"""
+import threading
+import time
+import unittest
+
+from utils.single_flight import SingleFlight
+
+
+class _Uncopyable:
+    def __deepcopy__(self, memo):
+        raise TypeError("cannot copy a client")
+
+
+class SingleFlightTest(unittest.TestCase):
+    def run_together(self, flight, fn, n=4):
+        """Call `flight.do("k", fn)` from n threads that start together; returns (results, errors)."""
+        barrier = threading.Barrier(n)
+        results, errors = [], []
+
+        def call():
+            barrier.wait()
+            try:
+                results.append(flight.do("k", fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call, daemon=True) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        self.assertFalse(any(t.is_alive() for t in threads), "a caller is still waiting")
+        return results, errors
+
+    def test_followers_share_one_call_and_get_copies(self):
+        flight = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"results": ["Om Beach"]}
+
+        results, errors = self.run_together(flight, fetch)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"results": ["Om Beach"]}] * 4)
+        self.assertEqual(len({id(r) for r in results}), 4)
+
+    def test_leader_error_reaches_followers(self):
+        def fetch():
+            time.sleep(0.2)
+            raise ValueError("upstream down")
+
+        results, errors = self.run_together(SingleFlight(), fetch)
+        self.assertEqual(results, [])
+        self.assertEqual([str(e) for e in errors], ["upstream down"] * 4)
+
+    def test_uncopyable_result_does_not_hang_followers(self):
+        value = _Uncopyable()
+
+        def fetch():
+            time.sleep(0.2)
+            return value
+
+        results, errors = self.run_together(SingleFlight(), fetch)
+        # the leader keeps its own result; followers get the copy error
+        self.assertEqual(results, [value])
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(isinstance(e, TypeError) for e in errors))
+
+
+if __name__ == "__main__":
+    unittest.main()
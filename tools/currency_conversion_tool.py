@@ -1,5 +1,5 @@
 import os
-from utils.currency_converter import CurrencyConverter
+from utils.currency_converter import Conversion, CurrencyConverter
 from typing import List
 from langchain.tools import tool
 from dotenv import load_dotenv
@@ -18,5 +18,10 @@ class CurrencyConverterTool:
         def convert_currency(amount:float, from_currency:str, to_currency:str):
             """Convert amount from one currency to another"""
             return self.currency_service.convert(amount, from_currency, to_currency)
+
+        @tool
+        def convert_currency_batch(conversions: List[Conversion]) -> List[dict]:
+            """Convert many amounts between currencies in one call (prefer this over repeated convert_currency calls)"""
+            return self.currency_service.convert_many([(c.amount, c.from_currency, c.to_currency) for c in conversions])
         
-        return [convert_currency]
\ No newline at end of file
+        return [convert_currency, convert_currency_batch]
@@ -1,41 +1,26 @@
-from utils.expense_calculator import Calculator
+from utils.budget_engine import BudgetEngine, CostSheet
 from typing import List
 from langchain.tools import tool
 
 
 class CalculatorTool:
-    def __init__(self):
-        self.calculator = Calculator()
+    def __init__(self, currency_service=None):
+        self.budget_engine = BudgetEngine(currency_service)
         self.calculator_tool_list = self._setup_tools()
 
     def _setup_tools(self) -> List:
         """Setup all tools for the calculator tool"""
 
         @tool
-        def estimate_total_hotel_cost(
-            price_per_night: float,
-            total_days: float
-        ) -> float:
-            """Calculate total hotel cost"""
-            return self.calculator.multiply(price_per_night, total_days)
+        def calculate_trip_budget(cost_sheet: CostSheet) -> dict:
+            """
+            Calculate the complete trip budget in one call.
+            Pass every cost at once (hotel stays, meals, transport legs, activities, each in its own currency);
+            returns the total, per person, per category and per day figures in the target currency.
+            """
+            try:
+                return self.budget_engine.compute(cost_sheet)
+            except ValueError as e:
+                return {"error": str(e)}
 
-        @tool
-        def calculate_total_expense(
-            costs: List[float]
-        ) -> float:
-            """Calculate total expense of the trip"""
-            return self.calculator.calculate_total(*costs)
-
-        @tool
-        def calculate_daily_expense_budget(
-            total_cost: float,
-            days: int
-        ) -> float:
-            """Calculate daily expense"""
-            return self.calculator.calculate_daily_budget(total_cost, days)
-
-        return [
-            estimate_total_hotel_cost,
-            calculate_total_expense,
-            calculate_daily_expense_budget,
-        ]
+        return [calculate_trip_budget]
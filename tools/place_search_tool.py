@@ -6,6 +6,9 @@ from dotenv import load_dotenv
 
 # Import new wrappers
 from utils.place_info_search import FoursquarePlaceSearchTool, TavilyPlaceSearchTool, LocationIQTool
+from utils.knowledge_base import get_knowledge_base
+from utils.quota import mark_degraded
+from exception.exceptionhandling import QuotaExceededError
 
 load_dotenv()
 
@@ -28,14 +31,44 @@ class PlaceSearchTool:
             self.locationiq = None
 
         self.tavily_search = TavilyPlaceSearchTool()
+        # precomputed dossiers for popular destinations (None when disabled)
+        self.knowledge_base = get_knowledge_base()
         self.place_search_tool_list = self._setup_tools()
 
+    def _from_dossier(self, place: str, section: str, heading: str, detailed: bool = False, allow_stale: bool = False):
+        """Tool answer from the destination dossier, or None when there is no fresh one."""
+        data = self.knowledge_base.lookup(place, section, allow_stale) if self.knowledge_base else None
+        if not data:
+            return None
+        if data.get("source") == "tavily":
+            return f"{heading}\n{data['text']}"
+        if detailed:
+            lines = [f"{i['name']} ({i['category']}) - {i['address']}" for i in data["items"]]
+        else:
+            lines = [i["name"] or "Unnamed place" for i in data["items"]]
+        return f"{heading}\n" + "\n".join(lines)
+
+    def _quota_exhausted(self, place: str, section: str, heading: str, error: QuotaExceededError, detailed: bool = False):
+        """
+        Answer when the Foursquare budget is spent: an outdated dossier if there is one,
+        otherwise a short notice. Tavily is paid per call, so it is not used to cover
+        for the free quota.
+        """
+        mark_degraded(f"foursquare: {section} unavailable ({error})")
+        known = self._from_dossier(place, section, heading, detailed, allow_stale=True)
+        if known:
+            return f"{known}\n(From an older saved guide; live search is over quota.)"
+        return f"Live {section} search for {place} is over quota right now; suggest well-known options instead."
+
     def _setup_tools(self) -> List:
         """Expose a set of tools for LangChain or other agent usage."""
 
         @tool
         def search_attractions(place: str) -> str:
             """Search attractions of a place using Foursquare, fallback to Tavily."""
+            known = self._from_dossier(place, "attractions", f"Top attractions in {place}:", detailed=True)
+            if known:
+                return known
             try:
                 res = self.foursquare.search_attractions(place)
                 # Normalize response into a readable list
@@ -48,6 +81,8 @@ class PlaceSearchTool:
                     items.append(f"{name} ({cat}) - {addr}")
                 if items:
                     return f"Top attractions in {place}:\n" + "\n".join(items)
+            except QuotaExceededError as e:
+                return self._quota_exhausted(place, "attractions", f"Top attractions in {place}:", e, detailed=True)
             except Exception as e:
                 tavily_result = self.tavily_search.tavily_search_attractions(place)
                 return f"Foursquare search failed ({e}).\nFallback results:\n{tavily_result}"
@@ -56,6 +91,9 @@ class PlaceSearchTool:
         @tool
         def search_restaurants(place: str) -> str:
             """Search restaurants of a place using Foursquare, fallback to Tavily."""
+            known = self._from_dossier(place, "restaurants", f"Top restaurants in {place}:", detailed=True)
+            if known:
+                return known
             try:
                 res = self.foursquare.search_restaurants(place)
                 items = []
@@ -66,6 +104,8 @@ class PlaceSearchTool:
                     items.append(f"{name} ({cat}) - {address}")
                 if items:
                     return f"Top restaurants in {place}:\n" + "\n".join(items)
+            except QuotaExceededError as e:
+                return self._quota_exhausted(place, "restaurants", f"Top restaurants in {place}:", e, detailed=True)
             except Exception as e:
                 tavily_result = self.tavily_search.tavily_search_restaurants(place)
                 return f"Foursquare search failed ({e}).\nFallback results:\n{tavily_result}"
@@ -74,6 +114,9 @@ class PlaceSearchTool:
         @tool
         def search_activities(place: str) -> str:
             """Search activities in a place using Foursquare, fallback to Tavily."""
+            known = self._from_dossier(place, "activities", f"Activities and experiences in {place}:")
+            if known:
+                return known
             try:
                 res = self.foursquare.search_activities(place)
                 items = []
@@ -81,6 +124,8 @@ class PlaceSearchTool:
                     items.append(r.get("name", "Unnamed place"))
                 if items:
                     return f"Activities and experiences in {place}:\n" + "\n".join(items)
+            except QuotaExceededError as e:
+                return self._quota_exhausted(place, "activities", f"Activities and experiences in {place}:", e)
             except Exception as e:
                 tavily_result = self.tavily_search.tavily_search_activity(place)
                 return f"Foursquare search failed ({e}).\nFallback results:\n{tavily_result}"
@@ -89,6 +134,9 @@ class PlaceSearchTool:
         @tool
         def search_transportation(place: str) -> str:
             """Search transport hubs (airport, train, bus) using Foursquare, fallback to Tavily."""
+            known = self._from_dossier(place, "transportation", f"Transportation options in {place}:")
+            if known:
+                return known
             try:
                 res = self.foursquare.search_transportation(place)
                 items = []
@@ -96,6 +144,8 @@ class PlaceSearchTool:
                     items.append(r.get("name", "Unnamed transport place"))
                 if items:
                     return f"Transportation options in {place}:\n" + "\n".join(items)
+            except QuotaExceededError as e:
+                return self._quota_exhausted(place, "transportation", f"Transportation options in {place}:", e)
             except Exception as e:
                 tavily_result = self.tavily_search.tavily_search_transportation(place)
                 return f"Foursquare search failed ({e}).\nFallback results:\n{tavily_result}"
@@ -105,6 +155,9 @@ class PlaceSearchTool:
         @tool
         def geocode_address(address: str) -> str:
             """Return lat/lon for a given address using LocationIQ."""
+            top = self.knowledge_base.lookup(address, "geocode") if self.knowledge_base else None
+            if top:
+                return f"{top.get('display_name')} -> lat: {top.get('lat')}, lon: {top.get('lon')}"
             if not self.locationiq:
                 return "LocationIQ not configured"
             try:
@@ -1,7 +1,9 @@
 import os
-from utils.weather_info import WeatherForecastTool
+import datetime
+from utils.weather_info import WeatherForecastTool, format_daily_forecast
+from utils.knowledge_base import get_knowledge_base
 from langchain.tools import tool
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 
 class WeatherInfoTool:
@@ -10,7 +12,18 @@ class WeatherInfoTool:
         self.api_key = os.environ.get("OPENWEATHER_API_KEY")
 
         self.weather_service = WeatherForecastTool(self.api_key)
+        self.knowledge_base = get_knowledge_base()
         self.weather_tool_list = self._setup_tools()
+
+    def _known_forecast(self, city: str, start_date: Optional[str], days: Optional[int]):
+        """Forecast days for the trip window from the destination dossier, or None to fetch live"""
+        known = self.knowledge_base.lookup(city, "weather") if self.knowledge_base else None
+        if not known:
+            return None
+        start = datetime.date.fromisoformat(start_date) if start_date else datetime.date.today()
+        end = (start + datetime.timedelta(days=days)).isoformat() if days else None
+        window = [d for d in known if d["date"] >= start.isoformat() and (end is None or d["date"] < end)]
+        return window or None
     
     def _setup_tools(self) -> List:
         """Setup all tools for the weather forecast tool"""
@@ -24,19 +37,23 @@ class WeatherInfoTool:
                 return f"Current weather in {city}: {temp}°C, {desc}"
             return f"Could not fetch weather for {city}"
         
-        @tool
-        def get_weather_forecast(city: str) -> str:
-            """Get weather forecast for a city"""
-            forecast_data = self.weather_service.get_forecast_weather(city)
-            if forecast_data and 'list' in forecast_data:
-                forecast_summary = []
-                for i in range(len(forecast_data['list'])):
-                    item = forecast_data['list'][i]
-                    date = item['dt_txt'].split(' ')[0]
-                    temp = item['main']['temp']
-                    desc = item['weather'][0]['description']
-                    forecast_summary.append(f"{date}: {temp} degree celcius , {desc}")
-                return f"Weather forecast for {city}:\n" + "\n".join(forecast_summary)
-            return f"Could not fetch forecast for {city}"
+        @tool(response_format="content_and_artifact")
+        def get_weather_forecast(city: str, start_date: Optional[str] = None, days: Optional[int] = None):
+            """
+            Get the per-day weather forecast for a city over the trip dates.
+            start_date is YYYY-MM-DD (default today), days is the trip length; forecasts reach 5 days ahead.
+            """
+            try:
+                daily = self._known_forecast(city, start_date, days)
+                if daily is None:
+                    daily = self.weather_service.get_daily_forecast(city, start_date, days)
+            except ValueError:
+                return f"Invalid start_date {start_date!r}, expected YYYY-MM-DD", []
+            if daily:
+                note = ""
+                if days and len(daily) < days:
+                    note = f"\n(Forecast only available up to {daily[-1]['date']})"
+                return f"Weather forecast for {city}:\n" + format_daily_forecast(daily) + note, daily
+            return f"Could not fetch forecast for {city}", []
     
         return [get_current_weather, get_weather_forecast]
\ No newline at end of file
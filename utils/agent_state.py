@@ -0,0 +1,99 @@
+"""
+Shared graph and compact in-flight agent state.
+
+Every concurrent /query used to build its own graph, tools and bound tool
+schemas, and holds its whole message history while it runs. With
+`agent_state.compact` on (env VOYAGEMATE_COMPACT_STATE=1/0 overrides it):
+
+- all requests share one compiled graph (`agent.agentic_workflow.get_graph`)
+  instead of each building its own tools and tool schemas; this is most of
+  the saving. Per-request state (messages, quota usage) lives in the stream
+  and the request's context, not in the graph
+- LLM responses enter the graph state without the provider metadata nothing
+  reads again (the raw tool-call JSON duplicated in additional_kwargs, token
+  usage copies, fingerprints); content, tool_calls and usage_metadata stay
+- tool outputs go through a small process-wide intern table, so concurrent
+  plans for the same destination share one copy of each result
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage
+
+from utils.config_loader import load_config
+
+# response_metadata keys that are read after the call (quota accounting, cache replay)
+KEPT_METADATA = ("model_name", "finish_reason", "cached")
+
+
+class ToolOutputTable:
+    """Bounded table of recent tool outputs; equal outputs share one string object."""
+
+    def __init__(self, max_entries: int = 256, min_length: int = 64):
+        self.max_entries = max_entries
+        self.min_length = min_length
+        self.shared = 0
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def intern(self, text: Any) -> Any:
+        if not isinstance(text, str) or len(text) < self.min_length:
+            return text
+        with self._lock:
+            shared = self._data.get(text)
+            if shared is not None:
+                self._data.move_to_end(text)
+                self.shared += 1
+                return shared
+            self._data[text] = text
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return text
+
+    def __len__(self):
+        return len(self._data)
+
+
+def compact_ai_message(message: Any) -> Any:
+    """An AIMessage with only the fields read after the call."""
+    if not isinstance(message, AIMessage):
+        return message
+    metadata = message.response_metadata or {}
+    return AIMessage(
+        content=message.content,
+        tool_calls=message.tool_calls,
+        invalid_tool_calls=message.invalid_tool_calls,
+        usage_metadata=message.usage_metadata,
+        response_metadata={k: metadata[k] for k in KEPT_METADATA if k in metadata},
+        id=message.id,
+    )
+
+
+_settings: Optional[dict] = None
+_tool_outputs: Optional[ToolOutputTable] = None
+_lock = threading.Lock()
+
+
+def _load_settings() -> dict:
+    global _settings, _tool_outputs
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                cfg = load_config().get("agent_state", {}) or {}
+                _tool_outputs = ToolOutputTable(cfg.get("intern_max_entries", 256))
+                _settings = cfg
+    return _settings
+
+
+def compact_state_enabled() -> bool:
+    override = os.environ.get("VOYAGEMATE_COMPACT_STATE")
+    if override is not None:
+        return override.strip().lower() in ("1", "true", "yes", "on")
+    return bool(_load_settings().get("compact", False))
+
+
+def get_tool_output_table() -> ToolOutputTable:
+    _load_settings()
+    return _tool_outputs
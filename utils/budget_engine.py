@@ -0,0 +1,144 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+TWO_PLACES = Decimal("0.01")
+
+
+class HotelStay(BaseModel):
+    name: str = Field(default="", description="Hotel name")
+    price_per_night: float = Field(description="Price per room per night")
+    nights: int = Field(description="Number of nights")
+    rooms: int = Field(default=1, description="Number of rooms")
+    start_day: int = Field(default=1, description="Trip day of the first night")
+    currency: str = Field(default="INR", description="Currency of price_per_night")
+
+
+class MealPlan(BaseModel):
+    cost_per_person_per_day: float = Field(description="Food cost per person per day")
+    days: Optional[int] = Field(default=None, description="Number of days (defaults to the whole trip)")
+    currency: str = Field(default="INR", description="Currency of the cost")
+
+
+class TransportLeg(BaseModel):
+    description: str = Field(default="", description="e.g. 'Bangalore to Gokarna bus'")
+    cost: float = Field(description="Cost of the leg for the whole group")
+    day: Optional[int] = Field(default=None, description="Trip day of the leg (spread over the trip if omitted)")
+    currency: str = Field(default="INR", description="Currency of the cost")
+
+
+class Activity(BaseModel):
+    name: str = Field(default="", description="Activity name")
+    cost_per_person: float = Field(description="Cost per person")
+    day: Optional[int] = Field(default=None, description="Trip day of the activity (spread over the trip if omitted)")
+    currency: str = Field(default="INR", description="Currency of the cost")
+
+
+class CostSheet(BaseModel):
+    """Structured cost sheet for a whole trip"""
+    days: int = Field(description="Trip length in days")
+    travelers: int = Field(default=1, description="Number of travelers")
+    target_currency: str = Field(default="INR", description="Currency for all results")
+    hotels: List[HotelStay] = Field(default_factory=list)
+    meals: List[MealPlan] = Field(default_factory=list)
+    transport: List[TransportLeg] = Field(default_factory=list)
+    activities: List[Activity] = Field(default_factory=list)
+
+
+def _dec(value: float) -> Decimal:
+    return Decimal(str(value))
+
+
+class BudgetEngine:
+    """
+    Compute a full trip budget (per day, per category, total) in one pass.
+    Amounts are kept as Decimal; all foreign-currency amounts are converted
+    with a single rate lookup for the target currency.
+    """
+
+    def __init__(self, currency_service=None):
+        self.currency_service = currency_service
+
+    def _conversion_factors(self, sheet: CostSheet) -> Dict[str, Decimal]:
+        """Factor to multiply an amount in each source currency by to get the target currency."""
+        target = sheet.target_currency.upper()
+        currencies = {item.currency.upper() for group in (sheet.hotels, sheet.meals, sheet.transport, sheet.activities) for item in group}
+        factors = {target: Decimal(1)}
+        foreign = currencies - {target}
+        if not foreign:
+            return factors
+        if self.currency_service is None:
+            raise ValueError(f"Currency conversion needed for {sorted(foreign)} but no converter is configured")
+        # one rate table for the target base covers every source currency
+        rates = self.currency_service.get_rates(target)
+        for cur in foreign:
+            if cur not in rates:
+                raise ValueError(f"{cur} not found in exchange rates.")
+            factors[cur] = Decimal(1) / _dec(rates[cur])
+        return factors
+
+    def compute(self, sheet: CostSheet) -> dict:
+        days = max(sheet.days, 1)
+        factors = self._conversion_factors(sheet)
+        per_day = [Decimal(0)] * days
+        per_category = {"hotel": Decimal(0), "food": Decimal(0), "transport": Decimal(0), "activities": Decimal(0)}
+
+        def add(category: str, amount: Decimal, currency: str, day: Optional[int] = None, span: int = 0):
+            amount = amount * factors[currency.upper()]
+            per_category[category] += amount
+            if day is not None:
+                per_day[day - 1] += amount
+                return
+            # unscheduled amounts are spread evenly over the first `span` days (default: whole trip)
+            slots = range(min(span, days) if span else days) or range(days)
+            share = amount / len(slots)
+            for i in slots:
+                per_day[i] += share
+
+        warnings = []
+        for h in sheet.hotels:
+            nightly = _dec(h.price_per_night) * h.rooms
+            # a night is charged on its own trip day; nights outside the trip are not charged
+            stay = [d for d in range(h.start_day, h.start_day + h.nights) if 1 <= d <= days]
+            if len(stay) < h.nights:
+                warnings.append(f"{h.name or 'Hotel'}: {h.nights - len(stay)} of {h.nights} nights fall outside "
+                                f"the {days}-day trip and were not counted")
+            for day in stay:
+                add("hotel", nightly, h.currency, day)
+        for m in sheet.meals:
+            meal_days = m.days or days
+            if meal_days > days:
+                warnings.append(f"Meals: {meal_days - days} of {meal_days} days fall outside "
+                                f"the {days}-day trip and were not counted")
+                meal_days = days
+            amount = _dec(m.cost_per_person_per_day) * sheet.travelers * meal_days
+            add("food", amount, m.currency, span=meal_days)
+        # like hotel nights, legs and activities scheduled outside the trip are not charged
+        for t in sheet.transport:
+            if t.day is not None and not 1 <= t.day <= days:
+                warnings.append(f"{t.description or 'Transport'}: day {t.day} falls outside "
+                                f"the {days}-day trip and was not counted")
+                continue
+            add("transport", _dec(t.cost), t.currency, t.day)
+        for a in sheet.activities:
+            if a.day is not None and not 1 <= a.day <= days:
+                warnings.append(f"{a.name or 'Activity'}: day {a.day} falls outside "
+                                f"the {days}-day trip and was not counted")
+                continue
+            add("activities", _dec(a.cost_per_person) * sheet.travelers, a.currency, a.day)
+
+        def q(x: Decimal) -> float:
+            return float(x.quantize(TWO_PLACES, rounding=ROUND_HALF_UP))
+
+        total = sum(per_category.values(), Decimal(0))
+        result = {
+            "currency": sheet.target_currency.upper(),
+            "total": q(total),
+            "per_person": q(total / max(sheet.travelers, 1)),
+            "daily_average": q(total / days),
+            "per_category": {k: q(v) for k, v in per_category.items()},
+            "per_day": [{"day": i + 1, "amount": q(v)} for i, v in enumerate(per_day)],
+        }
+        if warnings:
+            result["warnings"] = warnings
+        return result
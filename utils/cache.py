@@ -0,0 +1,429 @@
+"""
+Tiered cache shared by the provider wrappers and the /query result path.
+
+L1 is an in-process LRU holding Python objects; callers get copies, so they
+may mutate what they are given. L2 is optional and shared
+between uvicorn workers:
+- "file":  one mmap'd file per key under a directory (point it at /dev/shm
+           to keep it in shared memory)
+- "redis": any Redis-protocol server (see utils/cache_server.py for a local stand-in)
+
+Values going to L2 are serialized with msgpack when it is installed (JSON
+otherwise) and zlib-compressed above a size threshold, so large itinerary
+blobs stay small.
+"""
+import copy
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, JSON is the fallback
+    msgpack = None
+
+from exception.exceptionhandling import QuotaExceededError
+from utils.config_loader import load_config
+from utils.replay import replay_active
+from utils.single_flight import instance_key
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# 1-byte header flags for serialized values
+_FLAG_COMPRESSED = 0x01
+_FLAG_MSGPACK = 0x02
+COMPRESS_THRESHOLD = 1024
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a value for L2 storage."""
+    flags = 0
+    if msgpack is not None:
+        data = msgpack.packb(value, use_bin_type=True)
+        flags |= _FLAG_MSGPACK
+    else:
+        data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(data) > COMPRESS_THRESHOLD:
+        data = zlib.compress(data, 6)
+        flags |= _FLAG_COMPRESSED
+    return bytes([flags]) + data
+
+
+def loads(blob: bytes) -> Any:
+    """Inverse of dumps()."""
+    flags, data = blob[0], blob[1:]
+    if flags & _FLAG_COMPRESSED:
+        data = zlib.decompress(data)
+    if flags & _FLAG_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack-encoded cache entry but msgpack is not installed")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+class LRUCache:
+    """In-process LRU with per-entry TTL (L1). Stores Python objects as-is."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileBackend:
+    """
+    L2 backend storing one file per key, read back through mmap.
+    Layout: 8-byte big-endian float expiry (0 = never) followed by the payload.
+    Writes go to a temp file and are renamed into place, so readers in other
+    workers never see a partial entry.
+    """
+
+    _HEADER = struct.Struct(">d")
+
+    def __init__(self, directory: str, max_entries: int = 10000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    (expires_at,) = self._HEADER.unpack_from(m, 0)
+                    if expires_at and expires_at < time.time():
+                        expired = True
+                    else:
+                        return m[self._HEADER.size:]
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+        if expired:
+            self.delete(key)
+        return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        path = self._path(key)
+        expires_at = time.time() + ttl if ttl else 0.0
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self._HEADER.pack(expires_at))
+            f.write(value)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self._prune()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _prune(self) -> None:
+        """Drop the oldest entries once the directory grows past max_entries."""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")]
+        except FileNotFoundError:
+            return
+        overflow = len(entries) - self.max_entries
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for e in entries[:overflow]:
+            try:
+                os.remove(e.path)
+            except FileNotFoundError:
+                pass
+
+
+class RedisBackend:
+    """
+    Minimal Redis-protocol (RESP) client covering GET / SET PX / DEL.
+    Keeps one connection per thread; no redis-py dependency.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        conn = (sock, sock.makefile("rb"))
+        self._local.conn = conn
+        if self.password:
+            self._execute(b"AUTH", self.password.encode())
+        if self.db:
+            self._execute(b"SELECT", str(self.db).encode())
+        return conn
+
+    def _execute(self, *parts: bytes) -> Any:
+        conn = getattr(self._local, "conn", None) or self._connect()
+        sock, reader = conn
+        payload = [b"*%d\r\n" % len(parts)]
+        for p in parts:
+            payload.append(b"$%d\r\n%s\r\n" % (len(p), p))
+        try:
+            sock.sendall(b"".join(payload))
+            return self._read_reply(reader)
+        except OSError:
+            self.close()
+            raise
+
+    def _read_reply(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("cache server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RuntimeError(rest.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise ValueError(f"Unexpected RESP reply: {line!r}")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn:
+            sock, reader = conn
+            reader.close()
+            sock.close()
+        self._local.conn = None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._execute(b"GET", key.encode("utf-8"))
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        parts = [b"SET", key.encode("utf-8"), value]
+        if ttl:
+            parts += [b"PX", str(int(ttl * 1000)).encode()]
+        self._execute(*parts)
+
+    def delete(self, key: str) -> None:
+        self._execute(b"DEL", key.encode("utf-8"))
+
+
+class TieredCache:
+    """
+    L1 (in-process LRU) in front of an optional shared L2 backend.
+    L2 errors and undecodable entries are logged and treated as misses, so a
+    cache outage or a corrupt blob never fails a request.
+    """
+
+    def __init__(self, l1: LRUCache, l2=None, prefix: str = "voyagemate", default_ttls: Optional[dict] = None):
+        self.l1 = l1
+        self.l2 = l2
+        self.prefix = prefix
+        self.default_ttls = default_ttls or {}
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def ttl_for(self, namespace: str) -> Optional[float]:
+        return self.default_ttls.get(namespace)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        full_key = self._key(namespace, key)
+        value = self.l1.get(full_key, _MISSING)
+        if value is not _MISSING:
+            # L1 holds the only in-process copy; a caller mutating its result must not change it
+            return copy.deepcopy(value)
+        if self.l2 is None:
+            return default
+        try:
+            blob = self.l2.get(full_key)
+        except Exception as e:
+            logger.warning("L2 cache get failed for %s: %s", full_key, e)
+            return default
+        if blob is None:
+            return default
+        try:
+            value = loads(blob)
+        except Exception as e:
+            # a corrupt or unreadable entry is a miss; the next set overwrites it
+            logger.warning("L2 cache entry %s could not be decoded: %s", full_key, e)
+            return default
+        self.l1.set(full_key, copy.deepcopy(value), self.ttl_for(namespace))
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        full_key = self._key(namespace, key)
+        ttl = ttl if ttl is not None else self.ttl_for(namespace)
+        self.l1.set(full_key, copy.deepcopy(value), ttl)
+        if self.l2 is None:
+            return
+        try:
+            self.l2.set(full_key, dumps(value), ttl)
+        except Exception as e:
+            logger.warning("L2 cache set failed for %s: %s", full_key, e)
+
+    def delete(self, namespace: str, key: str) -> None:
+        full_key = self._key(namespace, key)
+        self.l1.delete(full_key)
+        if self.l2 is not None:
+            try:
+                self.l2.delete(full_key)
+            except Exception as e:
+                logger.warning("L2 cache delete failed for %s: %s", full_key, e)
+
+    def get_or_set(self, namespace: str, key: str, fn: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = fn()
+            if value is not None:
+                self.set(namespace, key, value, ttl)
+        return value
+
+
+def make_key(*parts: Any) -> str:
+    """Stable short key for arbitrary (JSON-serializable) call arguments."""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def build_cache(cache_config: dict) -> Optional[TieredCache]:
+    """Build a TieredCache from the `cache` section of config.yaml."""
+    if not cache_config or not cache_config.get("enabled", False):
+        return None
+    backend = os.environ.get("VOYAGEMATE_CACHE_BACKEND") or cache_config.get("backend", "memory")
+    if replay_active():
+        # start every recorded/replayed process cold, so both see the same upstream calls
+        backend = "memory"
+    l2 = None
+    if backend == "file":
+        l2 = FileBackend(cache_config.get("path", "/dev/shm/voyagemate-cache"),
+                         max_entries=cache_config.get("l2_max_entries", 10000))
+    elif backend == "redis":
+        l2 = RedisBackend(os.environ.get("VOYAGEMATE_CACHE_URL") or cache_config.get("url", "redis://localhost:6379/0"))
+    elif backend != "memory":
+        raise ValueError(f"Unknown cache backend: {backend}")
+    return TieredCache(
+        LRUCache(cache_config.get("l1_max_entries", 1024)),
+        l2,
+        prefix=cache_config.get("prefix", "voyagemate"),
+        default_ttls=cache_config.get("ttl", {}),
+    )
+
+
+_cache: Optional[TieredCache] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[TieredCache]:
+    """Process-wide cache built from config, or None when caching is disabled."""
+    global _cache, _cache_loaded
+    if not _cache_loaded:
+        with _cache_lock:
+            if not _cache_loaded:
+                _cache = build_cache(load_config().get("cache", {}))
+                _cache_loaded = True
+    return _cache
+
+
+def cached(namespace: str, provider: Optional[str] = None):
+    """
+    Decorator for provider wrapper methods: serve results from the tiered cache,
+    calling through on a miss. Empty results are not cached. A no-op when
+    caching is disabled in config.
+
+    With `provider` set, a long-lived stale copy is kept as well. It is served
+    instead of calling upstream once the provider's quota is nearly used up,
+    or when the call is rejected for exceeding its budget.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return fn(self, *args, **kwargs)
+            # differently configured wrappers (API key, units, limits) never share an entry
+            key = make_key(fn.__qualname__, instance_key(self), args, kwargs)
+            value = cache.get(namespace, key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if provider is None:
+                value = fn(self, *args, **kwargs)
+                if value:
+                    cache.set(namespace, key, value)
+                return value
+
+            from utils.quota import get_quota_manager, mark_degraded
+            stale_namespace = f"{namespace}:stale"
+            if get_quota_manager().near_exhaustion(provider):
+                value = cache.get(stale_namespace, key, _MISSING)
+                if value is not _MISSING:
+                    mark_degraded(f"{provider}: stale {namespace}")
+                    return value
+            try:
+                value = fn(self, *args, **kwargs)
+            except QuotaExceededError:
+                value = cache.get(stale_namespace, key, _MISSING)
+                if value is _MISSING:
+                    raise
+                mark_degraded(f"{provider}: stale {namespace}")
+                return value
+            if value:
+                cache.set(namespace, key, value)
+                cache.set(stale_namespace, key, value, cache.ttl_for("stale"))
+            return value
+        return wrapper
+    return decorator
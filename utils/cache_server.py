@@ -0,0 +1,128 @@
+"""
+Local stand-in for a Redis-protocol cache server.
+
+Implements just enough of RESP (PING, GET, SET [EX|PX], DEL, FLUSHALL, DBSIZE)
+for the RedisBackend in utils/cache.py, so the shared L2 cache can be exercised
+in development and CI without a real Redis.
+
+    python -m utils.cache_server --port 6390
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Store:
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at and expires_at < time.time():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl_ms=None):
+        with self.lock:
+            self.data[key] = (value, time.time() + ttl_ms / 1000 if ttl_ms else 0)
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for k in keys if self.data.pop(k, None) is not None)
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # inline command, e.g. from telnet
+            return line.strip().split()
+        parts = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+    def _reply(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(b":%d\r\n" % value)
+        elif isinstance(value, bytes):
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+        else:
+            self.wfile.write(b"+%s\r\n" % str(value).encode())
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            parts = self._read_command()
+            if parts is None:
+                return
+            if not parts:
+                continue
+            cmd = parts[0].upper()
+            if cmd == b"PING":
+                self._reply("PONG")
+            elif cmd == b"GET":
+                self._reply(store.get(parts[1]))
+            elif cmd == b"SET":
+                ttl_ms = None
+                if len(parts) >= 5 and parts[3].upper() in (b"EX", b"PX"):
+                    ttl_ms = int(parts[4]) * (1000 if parts[3].upper() == b"EX" else 1)
+                store.set(parts[1], parts[2], ttl_ms)
+                self._reply("OK")
+            elif cmd == b"DEL":
+                self._reply(store.delete(*parts[1:]))
+            elif cmd == b"DBSIZE":
+                self._reply(len(store.data))
+            elif cmd == b"FLUSHALL":
+                with store.lock:
+                    store.data.clear()
+                self._reply("OK")
+            elif cmd in (b"SELECT", b"AUTH"):
+                self._reply("OK")
+            else:
+                self.wfile.write(b"-ERR unknown command '%s'\r\n" % cmd)
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _RESPHandler)
+        self.store = _Store()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "CacheServer":
+        """Serve in a background thread (port 0 picks a free port)."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Redis-protocol stand-in for the VoyageMate cache")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = CacheServer(args.host, args.port)
+    print(f"Cache stand-in listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
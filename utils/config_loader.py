@@ -1,8 +1,13 @@
 import yaml
 import os
 
-def load_config(config_path: str = "config/config.yaml") -> dict:
+# config/config.yaml inside the installed package, so the entry point works from any directory
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "config.yaml")
+
+def load_config(config_path: str = None) -> dict:
+    """Load config.yaml; VOYAGEMATE_CONFIG points at another file"""
+    config_path = config_path or os.environ.get("VOYAGEMATE_CONFIG") or DEFAULT_CONFIG_PATH
     with open(config_path, "r") as file:
         config = yaml.safe_load(file)
         # print(config)
-    return config
\ No newline at end of file
+    return config
@@ -1,16 +1,77 @@
-import requests
+from typing import List, Tuple
+from pydantic import BaseModel, Field
+from utils.cache import cached
+from utils.single_flight import single_flight
+from utils.quota import metered
+from utils.replay import http_get
+
+# base of every rate matrix; any pair is derived from it as a cross rate
+MATRIX_BASE = "USD"
+
+class Conversion(BaseModel):
+    amount: float = Field(description="Amount to convert")
+    from_currency: str = Field(description="ISO code of the source currency, e.g. USD")
+    to_currency: str = Field(description="ISO code of the target currency, e.g. INR")
+
+class RateMatrix:
+    """Cross rates between any two currencies, derived from a single base rate table"""
+    def __init__(self, base_currency: str, rates: dict):
+        self.base_currency = base_currency
+        self.rates = rates
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        if from_currency not in self.rates:
+            raise ValueError(f"{from_currency} not found in exchange rates.")
+        if to_currency not in self.rates:
+            raise ValueError(f"{to_currency} not found in exchange rates.")
+        return self.rates[to_currency] / self.rates[from_currency]
 
 class CurrencyConverter:
     def __init__(self, api_key: str):
+        self.api_key = api_key
         self.base_url = f"https://v6.exchangerate-api.com/v6/{api_key}/latest/"
     
-    def convert(self, amount:float, from_currency:str, to_currency:str):
-        """Convert the amount from one currency to another"""
-        url = f"{self.base_url}/{from_currency}"
-        response = requests.get(url)
+    @cached("rates", provider="exchangerate")
+    @single_flight("exchangerate")
+    @metered("exchangerate")
+    def get_rates(self, base_currency:str) -> dict:
+        """Fetch all conversion rates for a base currency"""
+        url = f"{self.base_url}/{base_currency}"
+        response = http_get(url, redact=[self.api_key])
         if response.status_code != 200:
             raise Exception("API call failed:", response.json())
-        rates = response.json()["conversion_rates"]
+        return response.json()["conversion_rates"]
+
+    def convert(self, amount:float, from_currency:str, to_currency:str):
+        """Convert the amount from one currency to another"""
+        rates = self.get_rates(from_currency)
         if to_currency not in rates:
             raise ValueError(f"{to_currency} not found in exchange rates.")
-        return amount * rates[to_currency]
\ No newline at end of file
+        return amount * rates[to_currency]
+
+    def rate_matrix(self) -> RateMatrix:
+        """
+        Build a rate matrix with one rate fetch. The base is always MATRIX_BASE,
+        a currency the API is known to serve: a base taken from the request
+        could be an invalid code and fail the whole batch, and a fixed base
+        lets every batch share one cached rate table. Codes missing from the
+        table are reported per pair by `RateMatrix.rate`.
+        """
+        return RateMatrix(MATRIX_BASE, self.get_rates(MATRIX_BASE))
+
+    def convert_many(self, conversions: List[Tuple[float, str, str]]) -> List[dict]:
+        """Convert many (amount, from, to) triples against one rate matrix"""
+        conversions = [(amount, f.upper(), t.upper()) for amount, f, t in conversions]
+        if not conversions:
+            return []
+        matrix = self.rate_matrix()
+        results = []
+        for amount, from_currency, to_currency in conversions:
+            item = {"amount": amount, "from_currency": from_currency, "to_currency": to_currency}
+            try:
+                rate = matrix.rate(from_currency, to_currency)
+                item.update(rate=rate, converted=amount * rate)
+            except ValueError as e:
+                item["error"] = str(e)
+            results.append(item)
+        return results
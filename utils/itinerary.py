@@ -0,0 +1,134 @@
+"""
+Schema for the structured-output mode.
+
+In structured mode the agent finishes by calling the `Itinerary` tool instead
+of writing free Markdown. The tool-call arguments are validated with pydantic
+and mapped onto the same section dict that `split_sections` produces, so the
+frontend does not need to know which mode generated a plan.
+"""
+from typing import Any, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+ITINERARY_TOOL_NAME = "Itinerary"
+
+
+class DayPlan(BaseModel):
+    day: int = Field(description="Day number, starting at 1")
+    title: str = Field(default="", description="Short title for the day")
+    activities: List[str] = Field(default_factory=list, description="What to do that day, in order")
+
+    @property
+    def text(self) -> str:
+        return "\n".join(f"- {a}" for a in self.activities)
+
+
+class CostItem(BaseModel):
+    label: str = Field(description="Cost category, e.g. Hotel, Food, Transport, Activities")
+    amount: float = Field(description="Estimated amount for the whole trip")
+
+
+class Itinerary(BaseModel):
+    """Submit the complete travel plan. Call this exactly once, after all information has been gathered."""
+
+    destination: str = Field(description="Destination of the trip")
+    summary: str = Field(default="", description="One-paragraph overview of the trip")
+    generic_plan: List[DayPlan] = Field(default_factory=list, description="Day-by-day plan covering the popular tourist places")
+    offbeat_plan: List[DayPlan] = Field(default_factory=list, description="Day-by-day plan covering off-beat places in and around the destination")
+    attractions: List[str] = Field(default_factory=list, description="Names of recommended attractions")
+    hotels: List[str] = Field(default_factory=list, description="Recommended hotels with approx per night cost")
+    restaurants: List[str] = Field(default_factory=list, description="Recommended restaurants with prices")
+    transportation: List[str] = Field(default_factory=list, description="Available modes of transport with details")
+    costs: List[CostItem] = Field(default_factory=list, description="Cost breakdown by category")
+    total_cost: Optional[float] = Field(default=None, description="Total estimated cost of the trip")
+    daily_budget: Optional[float] = Field(default=None, description="Approximate expense per day")
+    currency: str = Field(default="INR", description="Currency of all amounts")
+    weather: str = Field(default="", description="Weather summary for the trip dates")
+
+
+def currency_symbol(currency: str) -> str:
+    """'INR' -> '₹'; codes without a symbol are used as a prefix ('THB 1,200')"""
+    return {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£"}.get(currency.upper(), f"{currency} ")
+
+
+def _days_markdown(heading: str, days: List[DayPlan]) -> str:
+    if not days:
+        return ""
+    lines = [heading]
+    for d in days:
+        lines.append(f"Day {d.day}: {d.title}".rstrip(": "))
+        lines.extend(f"- {a}" for a in d.activities)
+    return "\n".join(lines)
+
+
+def itinerary_to_markdown(itinerary: Itinerary) -> str:
+    """Render an itinerary as Markdown (used for `raw` and document export)."""
+    sym = currency_symbol(itinerary.currency)
+    blocks = [f"# Trip to {itinerary.destination}", itinerary.summary]
+    blocks.append(_days_markdown("## Generic Tourist Plan", itinerary.generic_plan))
+    blocks.append(_days_markdown("## Off-Beat Plan", itinerary.offbeat_plan))
+    for title, items in (("Hotels", itinerary.hotels), ("Restaurants", itinerary.restaurants),
+                         ("Transportation", itinerary.transportation)):
+        if items:
+            blocks.append(f"## {title}\n" + "\n".join(f"- {i}" for i in items))
+    if itinerary.costs or itinerary.total_cost is not None:
+        cost_lines = [f"- {c.label}: {sym}{c.amount:,.0f}" for c in itinerary.costs]
+        if itinerary.total_cost is not None:
+            cost_lines.append(f"- Total: {sym}{itinerary.total_cost:,.0f}")
+        blocks.append("## Cost Breakdown\n" + "\n".join(cost_lines))
+    if itinerary.daily_budget is not None:
+        blocks.append(f"## Daily Expense Budget\n{sym}{itinerary.daily_budget:,.0f} per day")
+    if itinerary.weather:
+        blocks.append(f"## Weather\n{itinerary.weather}")
+    return "\n\n".join(b for b in blocks if b)
+
+
+def itinerary_to_sections(itinerary: Itinerary, tools_used: Optional[List[str]] = None) -> dict:
+    """Map an itinerary onto the dict shape returned by `split_sections`."""
+    sym = currency_symbol(itinerary.currency)
+    costs = {c.label: int(round(c.amount)) for c in itinerary.costs}
+    if itinerary.total_cost is not None:
+        costs["Total"] = int(round(itinerary.total_cost))
+    day_by_day = [{"day": f"Day {d.day}: {d.title}".rstrip(": "), "text": d.text, "plan": "generic"}
+                  for d in itinerary.generic_plan]
+    day_by_day += [{"day": f"Off-Beat Day {d.day}: {d.title}".rstrip(": "), "text": d.text, "plan": "offbeat"}
+                   for d in itinerary.offbeat_plan]
+    return {
+        "intro": itinerary.summary,
+        "generic_plan": _days_markdown("Generic Tourist Plan", itinerary.generic_plan),
+        "offbeat_plan": _days_markdown("Off-Beat Plan", itinerary.offbeat_plan),
+        "cost_breakdown_text": "\n".join(f"{k}: {sym}{v:,}" for k, v in costs.items()),
+        "costs": costs,
+        "weather": itinerary.weather,
+        "daily_budget": f"{sym}{itinerary.daily_budget:,.0f} per day" if itinerary.daily_budget is not None else "",
+        "day_by_day": day_by_day,
+        "attractions_list": itinerary.attractions[:40],
+        "raw": itinerary_to_markdown(itinerary),
+        "tools_used": tools_used or [],
+        "currency": itinerary.currency,
+    }
+
+
+def find_itinerary_call(message: Any) -> Optional[dict]:
+    """Return the arguments of the Itinerary tool call on `message`, if any."""
+    for tc in getattr(message, "tool_calls", None) or []:
+        if tc.get("name") == ITINERARY_TOOL_NAME:
+            return tc.get("args") or {}
+    return None
+
+
+def validate_itinerary(args: Any) -> Tuple[Optional[Itinerary], Optional[str]]:
+    """Validate Itinerary tool-call arguments; (itinerary, None) or (None, the validation error)."""
+    if args is None:
+        return None, "No Itinerary call"
+    try:
+        if isinstance(args, (str, bytes)):
+            return Itinerary.model_validate_json(args), None
+        return Itinerary.model_validate(args), None
+    except ValidationError as e:
+        return None, str(e)
+
+
+def parse_itinerary(args: Any) -> Optional[Itinerary]:
+    """Validate Itinerary tool-call arguments; None if they do not match the schema."""
+    return validate_itinerary(args)[0]
@@ -0,0 +1,294 @@
+"""
+Precomputed destination dossiers.
+
+Most traffic asks about a small set of destinations. An offline job
+(`voyagemate kb refresh`) fetches attractions, restaurants, activities,
+transportation, coordinates and the weather forecast for each of them through
+the regular provider wrappers and stores normalized dossiers in a local
+SQLite file. The agent tools read them from memory and only go to the live
+APIs for places (or sections) that are missing or older than their max age.
+
+Each section is refreshed on its own schedule (`knowledge_base.max_age` in
+config.yaml): places change slowly, the forecast does not. A refresh only
+fetches what is stale, so it can run often; readers pick up a new generation
+of the file without a restart.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.cache import dumps, loads
+from utils.config_loader import load_config
+from utils.replay import replay_active
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ("attractions", "restaurants", "activities", "transportation", "geocode", "weather")
+
+DEFAULT_MAX_AGE = {
+    "attractions": 7 * 86400,
+    "restaurants": 7 * 86400,
+    "activities": 7 * 86400,
+    "transportation": 30 * 86400,
+    "geocode": 30 * 86400,
+    "weather": 3 * 3600,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dossiers (
+    place TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    rank INTEGER,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    place TEXT NOT NULL,
+    section TEXT NOT NULL,
+    data BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (place, section)
+);
+CREATE INDEX IF NOT EXISTS sections_by_age ON sections (section, fetched_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def place_key(name: str) -> str:
+    """'  Gokarna, ' -> 'gokarna', 'Paris,  Texas' -> 'paris, texas'"""
+    return re.sub(r"\s+", " ", (name or "").strip(" \t\n,.").lower())
+
+
+def normalize_foursquare(res) -> List[dict]:
+    """Foursquare search results -> [{"name", "category", "address"}]."""
+    items = []
+    for r in res.get("results", []) if isinstance(res, dict) else (res or []):
+        location = r.get("location", {})
+        items.append({
+            "name": r.get("name") or r.get("place_name") or r.get("display_name"),
+            "category": ", ".join(c.get("name") for c in r.get("categories", []) if c.get("name")),
+            "address": location.get("formatted_address")
+            or ", ".join(filter(None, [location.get("address"), location.get("locality")])),
+        })
+    return items
+
+
+class KnowledgeBase:
+    """
+    SQLite-backed dossier store. Writers (the refresh job) go to the file;
+    readers are served from an in-memory copy that is reloaded when the
+    file's generation changes (checked at most every `reload_interval` seconds).
+    """
+
+    def __init__(self, path: str, max_age: Dict[str, float] = None, reload_interval: float = 60,
+                 aliases: Dict[str, str] = None):
+        self.path = path
+        self.max_age = {**DEFAULT_MAX_AGE, **(max_age or {})}
+        # other spellings of a destination ('Gokarna, Karnataka' -> 'Gokarna'); anything else is its own place
+        self.aliases = {place_key(alias): place_key(name) for alias, name in (aliases or {}).items()}
+        self.reload_interval = reload_interval
+        self.hits = 0
+        self.misses = 0
+        self._sections: Dict[Tuple[str, str], Tuple[object, float]] = {}
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # ---- writer side ----
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def put(self, conn: sqlite3.Connection, name: str, section: str, data, fetched_at: float = None) -> None:
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        key = place_key(name)
+        conn.execute("INSERT INTO dossiers (place, name, updated_at) VALUES (?, ?, ?) "
+                     "ON CONFLICT(place) DO UPDATE SET updated_at = excluded.updated_at", (key, name, fetched_at))
+        conn.execute("INSERT OR REPLACE INTO sections (place, section, data, fetched_at) VALUES (?, ?, ?, ?)",
+                     (key, section, dumps(data), fetched_at))
+
+    def set_ranks(self, conn: sqlite3.Connection, names: List[str]) -> None:
+        for rank, name in enumerate(names, 1):
+            conn.execute("INSERT INTO dossiers (place, name, rank) VALUES (?, ?, ?) "
+                         "ON CONFLICT(place) DO UPDATE SET rank = excluded.rank", (place_key(name), name, rank))
+
+    def stale(self, conn: sqlite3.Connection, names: Iterable[str], sections: Iterable[str] = SECTIONS,
+              now: float = None) -> List[Tuple[str, str]]:
+        """(place name, section) pairs that are missing or older than their max age."""
+        now = time.time() if now is None else now
+        fetched = {(p, s): t for p, s, t in conn.execute("SELECT place, section, fetched_at FROM sections")}
+        return [(name, section) for name in names for section in sections
+                if now - fetched.get((place_key(name), section), 0) >= self.max_age.get(section, 0)]
+
+    def bump_generation(self, conn: sqlite3.Connection) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(time.time_ns()),))
+
+    # ---- reader side ----
+
+    def _read_generation(self) -> Optional[str]:
+        if not os.path.exists(self.path):
+            return None
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def load(self) -> None:
+        """(Re)load every section into memory if the file has a new generation."""
+        generation = self._read_generation()
+        self._checked_at = time.monotonic()
+        if generation is None or generation == self._generation:
+            return
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5)
+        try:
+            sections = {(p, s): (loads(data), t) for p, s, data, t in
+                        conn.execute("SELECT place, section, data, fetched_at FROM sections")}
+        finally:
+            conn.close()
+        self._sections = sections
+        self._generation = generation
+        logger.info("Loaded %d dossier sections from %s", len(sections), self.path)
+
+    def lookup(self, place: str, section: str, allow_stale: bool = False):
+        """Fresh dossier data for `place` (any age with `allow_stale`), or None (then the caller goes live)."""
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.reload_interval:
+                    try:
+                        self.load()
+                    except sqlite3.Error as e:
+                        logger.warning("Could not load knowledge base %s: %s", self.path, e)
+                        self._checked_at = time.monotonic()
+        key = place_key(place)
+        entry = self._sections.get((self.aliases.get(key, key), section))
+        if entry is None or (not allow_stale and time.time() - entry[1] >= self.max_age.get(section, 0)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "sections": len(self._sections),
+            "places": len({p for p, _ in self._sections}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class DossierBuilder:
+    """Fetches dossier sections through the provider wrappers (cached, metered, quota-limited)."""
+
+    def __init__(self, kb: KnowledgeBase, foursquare, tavily, locationiq=None, weather=None):
+        self.kb = kb
+        self.fetchers: Dict[str, Callable[[str], object]] = {
+            "attractions": lambda place: self._places(place, foursquare.search_attractions, tavily.tavily_search_attractions),
+            "restaurants": lambda place: self._places(place, foursquare.search_restaurants, tavily.tavily_search_restaurants),
+            "activities": lambda place: self._places(place, foursquare.search_activities, tavily.tavily_search_activity),
+            "transportation": lambda place: self._places(place, foursquare.search_transportation, tavily.tavily_search_transportation),
+        }
+        if locationiq is not None:
+            self.fetchers["geocode"] = lambda place: (locationiq.forward_geocode(place, limit=1) or [None])[0]
+        if weather is not None:
+            self.fetchers["weather"] = weather.get_daily_forecast
+
+    @staticmethod
+    def _places(place: str, search, fallback) -> Optional[dict]:
+        try:
+            items = normalize_foursquare(search(place))
+            if items:
+                return {"source": "foursquare", "items": items}
+        except Exception as e:
+            logger.info("Foursquare failed for %s (%s), using Tavily", place, e)
+        text = fallback(place)
+        return {"source": "tavily", "text": text if isinstance(text, str) else str(text)} if text else None
+
+    def refresh(self, names: List[str], force: bool = False, jobs: int = 4) -> dict:
+        """Fetch every stale (or, with `force`, every) section of `names`; returns counts."""
+        conn = self.kb.connect()
+        try:
+            self.kb.set_ranks(conn, names)
+            sections = [s for s in SECTIONS if s in self.fetchers]
+            todo = [(n, s) for n in names for s in sections] if force else self.kb.stale(conn, names, sections)
+            stats = {"places": len(names), "stale": len(todo), "updated": 0, "empty": 0, "failed": 0}
+
+            def fetch(item):
+                name, section = item
+                try:
+                    return name, section, self.fetchers[section](name), None
+                except Exception as e:
+                    return name, section, None, e
+
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                for name, section, data, error in pool.map(fetch, todo):
+                    if error is not None:
+                        stats["failed"] += 1
+                        logger.warning("Refreshing %s/%s failed: %s", name, section, error)
+                    elif not data:
+                        stats["empty"] += 1
+                    else:
+                        self.kb.put(conn, name, section, data)
+                        stats["updated"] += 1
+                        # commit as we go so an interrupted run keeps its progress
+                        conn.commit()
+            if stats["updated"]:
+                self.kb.bump_generation(conn)
+            conn.commit()
+            return stats
+        finally:
+            conn.close()
+
+
+def default_destinations(top: int = None) -> List[str]:
+    cfg = load_config().get("knowledge_base", {}) or {}
+    names = cfg.get("destinations", []) or []
+    return names[: top or cfg.get("top_n") or len(names)]
+
+
+def build_dossier_builder(kb: KnowledgeBase) -> DossierBuilder:
+    """Builder over the same provider wrappers the agent tools use (keys from the environment)."""
+    from utils.place_info_search import FoursquarePlaceSearchTool, LocationIQTool, TavilyPlaceSearchTool
+    from utils.weather_info import WeatherForecastTool
+
+    locationiq = LocationIQTool() if os.environ.get("LOCATIONIQ_API_KEY") else None
+    weather = WeatherForecastTool(os.environ["OPENWEATHER_API_KEY"]) if os.environ.get("OPENWEATHER_API_KEY") else None
+    return DossierBuilder(kb, FoursquarePlaceSearchTool(), TavilyPlaceSearchTool(), locationiq, weather)
+
+
+_kb: Optional[KnowledgeBase] = None
+_kb_loaded = False
+_kb_lock = threading.Lock()
+
+
+def get_knowledge_base() -> Optional[KnowledgeBase]:
+    """Process-wide knowledge base from the `knowledge_base` config section, or None if disabled."""
+    global _kb, _kb_loaded
+    if not _kb_loaded:
+        with _kb_lock:
+            if not _kb_loaded:
+                cfg = load_config().get("knowledge_base", {}) or {}
+                # dossiers would answer calls a trace being recorded or replayed expects to see
+                if cfg.get("enabled", False) and not replay_active():
+                    _kb = KnowledgeBase(cfg.get("path", "./data/knowledge_base.sqlite3"),
+                                        max_age=cfg.get("max_age"),
+                                        reload_interval=cfg.get("reload_interval", 60),
+                                        aliases=cfg.get("aliases"))
+                    _kb.load()
+                _kb_loaded = True
+    return _kb
@@ -0,0 +1,169 @@
+"""
+Deterministic cache for LLM calls made by the agent.
+
+Keyed by a stable hash of the model name, the bound tool schemas and the
+serialized message list, so the same conversation state never pays for the
+same completion twice. Entries live in a size-bounded on-disk store shared by
+all workers. Calls with a non-zero temperature bypass the cache unless
+explicitly allowed in config.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, List, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from utils.cache import FileBackend, LRUCache, TieredCache
+from utils.config_loader import load_config
+from utils.single_flight import get_flight
+from utils.quota import get_quota_manager
+from utils.replay import replay_active
+
+
+def _message_fingerprint(message: Any) -> dict:
+    """
+    Serialize a message without the fields that change between otherwise
+    identical runs (message ids, provider tool-call ids, response metadata).
+    """
+    if not isinstance(message, BaseMessage):
+        return {"type": "human", "content": str(message)}
+    data = {"type": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        data["tool_calls"] = [{"name": tc["name"], "args": tc["args"]} for tc in tool_calls]
+    name = getattr(message, "name", None)
+    if name:
+        data["name"] = name
+    return data
+
+
+def model_name_of(llm: Any) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+def llm_cache_key(model_name: str, tools: List, messages: List) -> str:
+    """Stable hash of model name, bound tool schemas and message list."""
+    payload = {
+        "model": model_name,
+        "tools": [convert_to_openai_tool(t) for t in tools],
+        "messages": [_message_fingerprint(m) for m in messages],
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Size-bounded persistent store of LLM responses plus hit/miss counters."""
+
+    def __init__(self, store: TieredCache, allow_nonzero_temperature: bool = False):
+        self.store = store
+        self.allow_nonzero_temperature = allow_nonzero_temperature
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+    def cacheable(self, llm: Any) -> bool:
+        """Only deterministic (temperature 0) models are cached by default."""
+        if self.allow_nonzero_temperature:
+            return True
+        return getattr(llm, "temperature", None) == 0
+
+    def get(self, key: str) -> Optional[BaseMessage]:
+        data = self.store.get("llm", key)
+        if data is None:
+            return None
+        message = messages_from_dict([data])[0]
+        # give replayed messages a fresh id so add_messages never merges them
+        message.id = None
+        # lets cost accounting tell replayed responses from paid ones
+        message.response_metadata["cached"] = True
+        return message
+
+    def set(self, key: str, message: BaseMessage) -> None:
+        self.store.set("llm", key, message_to_dict(message))
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CachedLLM:
+    """
+    Wraps `llm.bind_tools(...)` so `invoke` is answered from the LLM cache.
+    Identical concurrent misses are coalesced through single-flight.
+    """
+
+    def __init__(self, runnable: Any, llm: Any, tools: List, cache: LLMResponseCache):
+        self.runnable = runnable
+        self.llm = llm
+        self.tools = tools
+        self.cache = cache
+        self.model_name = model_name_of(llm)
+
+    def invoke(self, messages: List, *args, **kwargs):
+        if not self.cache.cacheable(self.llm):
+            self.cache._count("bypassed")
+            return self.runnable.invoke(messages, *args, **kwargs)
+
+        key = llm_cache_key(self.model_name, self.tools, messages)
+        cached_response = self.cache.get(key)
+        if cached_response is not None:
+            self.cache._count("hits")
+            get_quota_manager().record_llm(None, cached_response)
+            return cached_response
+
+        self.cache._count("misses")
+
+        def _call():
+            response = self.runnable.invoke(messages, *args, **kwargs)
+            self.cache.set(key, response)
+            return response
+
+        return get_flight("llm").do(key, _call)
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_loaded = False
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide LLM cache built from the `llm_cache` config section, or None if disabled."""
+    global _llm_cache, _llm_cache_loaded
+    if not _llm_cache_loaded:
+        with _llm_cache_lock:
+            if not _llm_cache_loaded:
+                cfg = load_config().get("llm_cache", {})
+                # a cache hit would keep the call out of a trace being recorded or replayed
+                if cfg.get("enabled", False) and not replay_active():
+                    store = TieredCache(
+                        LRUCache(cfg.get("l1_max_entries", 256)),
+                        FileBackend(cfg.get("path", "./.cache/llm"), max_entries=cfg.get("max_entries", 5000)),
+                        default_ttls={"llm": cfg.get("ttl")},
+                    )
+                    _llm_cache = LLMResponseCache(store, cfg.get("allow_nonzero_temperature", False))
+                _llm_cache_loaded = True
+    return _llm_cache
+
+
+def with_llm_cache(runnable: Any, llm: Any, tools: List) -> Any:
+    """Return `runnable` wrapped in the LLM cache when it is enabled."""
+    cache = get_llm_cache()
+    if cache is None:
+        return runnable
+    return CachedLLM(runnable, llm, tools, cache)
@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 from typing import Literal, Optional, Any
 from pydantic import BaseModel, Field
 from utils.config_loader import load_config
+from utils.replay import with_replay
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 
@@ -25,22 +26,42 @@ class ModelLoader(BaseModel):
     class Config:
         arbitrary_types_allowed = True
     
-    def load_llm(self):
+    def tiering_enabled(self) -> bool:
+        """Per-node model selection (llm.tiering), overridable with VOYAGEMATE_MODEL_TIERING=1/0"""
+        override = os.environ.get("VOYAGEMATE_MODEL_TIERING")
+        if override is not None:
+            return override.strip().lower() in ("1", "true", "yes", "on")
+        return bool((self.config["llm"].get("tiering") or {}).get("enabled", False))
+
+    def tier_settings(self, tier: str) -> dict:
+        """load_llm() overrides for a tier ("routing" or "synthesis")"""
+        return dict((self.config["llm"].get("tiering") or {}).get(tier) or {})
+
+    def load_llm(self, model_name: Optional[str] = None, temperature: Optional[float] = None, max_tokens: Optional[int] = None):
         """
         Load and return the LLM model.
+        model_name / temperature / max_tokens override the provider's config (used by model tiers).
         """
         print("LLM loading...")
         print(f"Loading model from provider: {self.model_provider}")
         if self.model_provider == "groq":
             print("Loading LLM from Groq..............")
             groq_api_key = os.getenv("GROQ_API_KEY")
-            model_name = self.config["llm"]["groq"]["model_name"]
-            llm=ChatGroq(model=model_name, api_key=groq_api_key)
+            model_name = model_name or self.config["llm"]["groq"]["model_name"]
+            if temperature is None:
+                temperature = self.config["llm"]["groq"].get("temperature")
+            kwargs = {}
+            if temperature is not None:
+                kwargs["temperature"] = temperature
+            if max_tokens is not None:
+                kwargs["max_tokens"] = max_tokens
+            llm=ChatGroq(model=model_name, api_key=groq_api_key, **kwargs)
         elif self.model_provider == "openai":
             print("Loading LLM from OpenAI..............")
             openai_api_key = os.getenv("OPENAI_API_KEY")
-            model_name = self.config["llm"]["openai"]["model_name"]
-            llm = ChatOpenAI(model_name="o4-mini", api_key=openai_api_key)
+            kwargs = {"max_tokens": max_tokens} if max_tokens is not None else {}
+            llm = ChatOpenAI(model_name=model_name or "o4-mini", api_key=openai_api_key, **kwargs)
         
-        return llm
+        # recorded or replayed when VOYAGEMATE_REPLAY_MODE is set
+        return with_replay(llm)
     
\ No newline at end of file
@@ -1,7 +1,10 @@
 # place_info_search.py
 import os
-import requests
 from langchain_tavily import TavilySearch
+from utils.cache import cached
+from utils.single_flight import single_flight
+from utils.quota import metered
+from utils.replay import http_get, traced_call
 
 class FoursquarePlaceSearchTool:
     """
@@ -21,6 +24,9 @@ class FoursquarePlaceSearchTool:
             "Authorization": self.api_key
         }
 
+    @cached("places", provider="foursquare")
+    @single_flight("foursquare")
+    @metered("foursquare")
     def _search(self, query: str = None, near: str = None, ll: str = None, limit: int = 10, categories: str = None):
         """
         Generic search wrapper.
@@ -40,7 +46,7 @@ class FoursquarePlaceSearchTool:
             params["categories"] = categories
 
         url = f"{self.base_url}/search"
-        resp = requests.get(url, headers=self.headers, params=params, timeout=10)
+        resp = http_get(url, headers=self.headers, params=params, timeout=10)
         resp.raise_for_status()
         return resp.json()
 
@@ -76,22 +82,27 @@ class LocationIQTool:
         self.geocode_url = "https://us1.locationiq.com/v1"
         self.directions_base = "https://us1.locationiq.com/v1/directions"
 
+    @cached("places", provider="locationiq")
+    @metered("locationiq")
     def forward_geocode(self, query: str, limit: int = 5):
         """Return forward geocoding results for `query`."""
         url = f"{self.geocode_url}/search.php"
         params = {"key": self.api_key, "q": query, "format": "json", "limit": limit}
-        resp = requests.get(url, params=params, timeout=10)
+        resp = http_get(url, params=params, timeout=10)
         resp.raise_for_status()
         return resp.json()
 
+    @cached("places", provider="locationiq")
+    @metered("locationiq")
     def reverse_geocode(self, lat: float, lon: float):
         """Reverse geocode lat/lon to address."""
         url = f"{self.geocode_url}/reverse.php"
         params = {"key": self.api_key, "lat": lat, "lon": lon, "format": "json"}
-        resp = requests.get(url, params=params, timeout=10)
+        resp = http_get(url, params=params, timeout=10)
         resp.raise_for_status()
         return resp.json()
 
+    @metered("locationiq")
     def get_directions(self, start_lat: float, start_lon: float, end_lat: float, end_lon: float, profile: str = "driving"):
         """
         Get directions from A -> B.
@@ -102,7 +113,7 @@ class LocationIQTool:
         coords = f"{start_lon},{start_lat};{end_lon},{end_lat}"
         url = f"{self.directions_base}/{profile}/{coords}"
         params = {"key": self.api_key, "overview": "false", "steps": "true"}
-        resp = requests.get(url, params=params, timeout=10)
+        resp = http_get(url, params=params, timeout=10)
         resp.raise_for_status()
         return resp.json()
 
@@ -113,30 +124,42 @@ class TavilyPlaceSearchTool:
     def __init__(self):
         pass
 
+    @cached("places", provider="tavily")
+    @metered("tavily")
     def tavily_search_attractions(self, place: str) -> dict:
         tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"top attractive places in and around {place}"})
+        query = f"top attractive places in and around {place}"
+        result = traced_call("tavily", {"query": query}, lambda: tavily_tool.invoke({"query": query}))
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
 
+    @cached("places", provider="tavily")
+    @metered("tavily")
     def tavily_search_restaurants(self, place: str) -> dict:
         tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"what are the top 10 restaurants and eateries in and around {place}."})
+        query = f"what are the top 10 restaurants and eateries in and around {place}."
+        result = traced_call("tavily", {"query": query}, lambda: tavily_tool.invoke({"query": query}))
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
 
+    @cached("places", provider="tavily")
+    @metered("tavily")
     def tavily_search_activity(self, place: str) -> dict:
         tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"activities in and around {place}"})
+        query = f"activities in and around {place}"
+        result = traced_call("tavily", {"query": query}, lambda: tavily_tool.invoke({"query": query}))
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
 
+    @cached("places", provider="tavily")
+    @metered("tavily")
     def tavily_search_transportation(self, place: str) -> dict:
         tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"What are the different modes of transportations available in {place}"})
+        query = f"What are the different modes of transportations available in {place}"
+        result = traced_call("tavily", {"query": query}, lambda: tavily_tool.invoke({"query": query}))
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
@@ -0,0 +1,256 @@
+"""
+Upstream quota budgeting and per-request cost accounting.
+
+Every real upstream call (cache hits and coalesced single-flight followers
+do not count) goes through `QuotaManager.acquire`, which enforces the
+per-minute and per-day budgets from the `quotas` config section and charges
+the call to the current request and tenant. LLM token usage is recorded
+from each response's usage metadata and priced per model when the provider
+lists model-specific prices.
+
+Counters are per process: with N workers, set budgets to 1/N of the
+provider quota.
+"""
+import contextvars
+import functools
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Optional
+
+from exception.exceptionhandling import QuotaExceededError
+from utils.config_loader import load_config
+
+
+class RequestUsage:
+    """Provider calls, LLM tokens and estimated cost of one /query."""
+
+    def __init__(self, tenant: str = "default"):
+        self.tenant = tenant
+        self.calls = Counter()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_llm_calls = 0
+        self.models = defaultdict(Counter)  # model -> calls/tokens
+        self.cost = 0.0
+        self.degraded = []
+        self._lock = threading.Lock()
+
+    def summary(self) -> dict:
+        return {
+            "tenant": self.tenant,
+            "provider_calls": dict(self.calls),
+            "llm": {
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cached_calls": self.cached_llm_calls,
+                "models": {m: dict(c) for m, c in self.models.items()},
+            },
+            "estimated_cost_usd": round(self.cost, 6),
+            "degraded": list(self.degraded),
+        }
+
+
+_current_usage: contextvars.ContextVar[Optional[RequestUsage]] = contextvars.ContextVar("voyagemate_usage", default=None)
+
+
+def begin_request(tenant: str = "default") -> RequestUsage:
+    """Start accounting for the current request (propagates to tool threads via the context)."""
+    usage = RequestUsage(tenant)
+    _current_usage.set(usage)
+    return usage
+
+
+def current_usage() -> Optional[RequestUsage]:
+    return _current_usage.get()
+
+
+class _Window:
+    """Fixed-window counter (minute or day)."""
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.window = None
+        self.count = 0
+
+    def _roll(self, now: float):
+        window = int(now // self.seconds)
+        if window != self.window:
+            self.window, self.count = window, 0
+
+    def used(self, now: float) -> int:
+        self._roll(now)
+        return self.count
+
+    def add(self, now: float):
+        self._roll(now)
+        self.count += 1
+
+
+class QuotaManager:
+    def __init__(self, providers: dict, degrade_at: float = 0.9):
+        self.budgets = providers or {}
+        self.degrade_at = degrade_at
+        self._minute = defaultdict(lambda: _Window(60))
+        self._day = defaultdict(lambda: _Window(86400))
+        self._totals = defaultdict(Counter)  # provider -> calls/cost counters
+        self._tenants = defaultdict(Counter)  # tenant -> calls/tokens/cost
+        self._lock = threading.Lock()
+
+    def usage_fraction(self, provider: str) -> float:
+        """Highest share of the minute/day budget used so far (0 when unlimited)."""
+        budget = self.budgets.get(provider, {})
+        now = time.time()
+        with self._lock:
+            fractions = [0.0]
+            if budget.get("per_minute"):
+                fractions.append(self._minute[provider].used(now) / budget["per_minute"])
+            if budget.get("per_day"):
+                fractions.append(self._day[provider].used(now) / budget["per_day"])
+        return max(fractions)
+
+    def near_exhaustion(self, provider: str) -> bool:
+        return self.usage_fraction(provider) >= self.degrade_at
+
+    def check(self, provider: str) -> None:
+        """Raise QuotaExceededError if a call to `provider` would exceed its budget."""
+        budget = self.budgets.get(provider, {})
+        now = time.time()
+        with self._lock:
+            self._check_locked(provider, budget, now)
+
+    def _check_locked(self, provider: str, budget: dict, now: float) -> None:
+        if budget.get("per_minute") and self._minute[provider].used(now) >= budget["per_minute"]:
+            raise QuotaExceededError(provider, "per-minute", budget["per_minute"])
+        if budget.get("per_day") and self._day[provider].used(now) >= budget["per_day"]:
+            raise QuotaExceededError(provider, "daily", budget["per_day"])
+
+    def acquire(self, provider: str) -> None:
+        """Reserve one upstream call, charging it to the current request and tenant."""
+        budget = self.budgets.get(provider, {})
+        cost = budget.get("cost_per_call", 0.0)
+        now = time.time()
+        usage = current_usage()
+        with self._lock:
+            self._check_locked(provider, budget, now)
+            self._minute[provider].add(now)
+            self._day[provider].add(now)
+            self._totals[provider]["calls"] += 1
+            self._totals[provider]["cost"] += cost
+            tenant = usage.tenant if usage else "default"
+            self._tenants[tenant][f"{provider}_calls"] += 1
+            self._tenants[tenant]["cost"] += cost
+        if usage is not None:
+            with usage._lock:
+                usage.calls[provider] += 1
+                usage.cost += cost
+
+    def record_llm(self, provider: str, message: Any, model: str = None) -> None:
+        """Account the tokens of one LLM response; cached responses cost nothing."""
+        usage = current_usage()
+        metadata = getattr(message, "usage_metadata", None) or {}
+        if (getattr(message, "response_metadata", None) or {}).get("cached"):
+            if usage is not None:
+                with usage._lock:
+                    usage.cached_llm_calls += 1
+            return
+        budget = self.budgets.get(provider, {})
+        model = model or (getattr(message, "response_metadata", None) or {}).get("model_name")
+        # model-specific prices override the provider's defaults
+        budget = {**budget, **(budget.get("models") or {}).get(model, {})}
+        input_tokens = metadata.get("input_tokens", 0)
+        output_tokens = metadata.get("output_tokens", 0)
+        cost = (input_tokens * budget.get("cost_per_1k_input_tokens", 0.0)
+                + output_tokens * budget.get("cost_per_1k_output_tokens", 0.0)) / 1000
+        now = time.time()
+        with self._lock:
+            self._minute[provider].add(now)
+            self._day[provider].add(now)
+            totals = self._totals[provider]
+            totals["calls"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["output_tokens"] += output_tokens
+            totals["cost"] += cost
+            tenant = self._tenants[usage.tenant if usage else "default"]
+            tenant[f"{provider}_calls"] += 1
+            tenant["input_tokens"] += input_tokens
+            tenant["output_tokens"] += output_tokens
+            tenant["cost"] += cost
+        if usage is not None:
+            with usage._lock:
+                usage.calls[provider] += 1
+                usage.input_tokens += input_tokens
+                usage.output_tokens += output_tokens
+                usage.cost += cost
+                if model:
+                    usage.models[model]["calls"] += 1
+                    usage.models[model]["input_tokens"] += input_tokens
+                    usage.models[model]["output_tokens"] += output_tokens
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            providers = {}
+            for name in set(self.budgets) | set(self._totals):
+                budget = self.budgets.get(name, {})
+                providers[name] = {
+                    "minute_used": self._minute[name].used(now),
+                    "per_minute": budget.get("per_minute"),
+                    "day_used": self._day[name].used(now),
+                    "per_day": budget.get("per_day"),
+                    **{k: round(v, 6) for k, v in self._totals[name].items()},
+                }
+            tenants = {t: {k: round(v, 6) for k, v in c.items()} for t, c in self._tenants.items()}
+        return {"providers": providers, "tenants": tenants}
+
+
+_quota: Optional[QuotaManager] = None
+_quota_lock = threading.Lock()
+
+
+def get_quota_manager() -> QuotaManager:
+    """Process-wide quota manager built from the `quotas` config section."""
+    global _quota
+    with _quota_lock:
+        if _quota is None:
+            cfg = load_config().get("quotas", {})
+            _quota = QuotaManager(cfg.get("providers", {}), cfg.get("degrade_at", 0.9))
+        return _quota
+
+
+def metered(provider: str):
+    """Decorator for methods that make one real upstream call to `provider`."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            get_quota_manager().acquire(provider)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def mark_degraded(reason: str) -> None:
+    """Note on the current request that an answer was served in degraded form."""
+    usage = current_usage()
+    if usage is not None:
+        with usage._lock:
+            usage.degraded.append(reason)
+
+
+class MeteredLLM:
+    """Wraps a bound chat model: enforces the provider budget and accounts tokens of real calls."""
+
+    def __init__(self, runnable: Any, provider: str, model: str = None):
+        self.runnable = runnable
+        self.provider = provider
+        self.model = model
+
+    def invoke(self, messages, *args, **kwargs):
+        quota = get_quota_manager()
+        quota.check(self.provider)
+        response = self.runnable.invoke(messages, *args, **kwargs)
+        quota.record_llm(self.provider, response, self.model)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
@@ -0,0 +1,286 @@
+"""
+Deterministic record/replay of every upstream call the agent makes.
+
+- record: LLM completions and provider HTTP calls go out as usual and each
+  request/response pair is appended to a gzip'd JSON-lines trace file
+- replay: nothing leaves the process; responses are served from the trace,
+  with their original latency or none at all
+- off (default): calls go straight through
+
+Calls are matched by a key built from the request (model, tool schemas and
+messages for the LLM; method, URL and params for HTTP). API keys are never
+part of a key or a trace. Identical requests are served in the order they
+were recorded.
+
+Configured by the `replay` section of config.yaml, overridable with the
+VOYAGEMATE_REPLAY_MODE, VOYAGEMATE_REPLAY_FILE and VOYAGEMATE_REPLAY_LATENCY
+environment variables. Record with a single process (the pre-fork server
+would have every worker write the same file).
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Iterable, List, Optional
+
+import requests
+
+from exception.exceptionhandling import ReplayMissError
+from utils.config_loader import load_config
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+LATENCIES = ("original", "zero")
+
+# query parameters that carry credentials; dropped from keys and traces
+SECRET_PARAMS = {"key", "appid", "apikey", "api_key", "access_token"}
+
+
+def _key(kind: str, request: Any) -> str:
+    raw = json.dumps(request, sort_keys=True, default=str, separators=(",", ":"))
+    return f"{kind}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+class TraceStore:
+    """
+    One trace file. In record mode entries are appended as calls complete;
+    in replay mode the whole file is loaded and served per key, in order.
+    """
+
+    def __init__(self, path: str, mode: str, latency: str = "original"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        if latency not in LATENCIES:
+            raise ValueError(f"Unknown replay latency: {latency}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.recorded = 0
+        self.replayed = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries = defaultdict(deque)
+        self._last = {}
+        if mode == "replay":
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        logger.info("Loaded %d traced calls from %s", sum(len(q) for q in self._entries.values()), self.path)
+
+    def record(self, kind: str, key: str, request: Any, response: Any, latency: float) -> None:
+        entry = {"kind": kind, "key": key, "request": request, "response": response, "latency": round(latency, 4)}
+        line = json.dumps(entry, ensure_ascii=False, default=str, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = gzip.open(self.path, "wt", encoding="utf-8")
+            self._file.write(line)
+            self.recorded += 1
+
+    def lookup(self, key: str) -> dict:
+        """
+        Next recorded entry for `key`. Once a key's entries are used up its
+        last one is served again, so extra identical calls still replay.
+        """
+        with self._lock:
+            queue = self._entries.get(key)
+            if queue:
+                entry = self._last[key] = queue.popleft()
+            elif key in self._last:
+                entry = self._last[key]
+            else:
+                raise ReplayMissError(key, self.path)
+            self.replayed += 1
+        if self.latency == "original" and entry.get("latency"):
+            time.sleep(entry["latency"])
+        return entry
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "path": self.path, "latency": self.latency,
+                "recorded": self.recorded, "replayed": self.replayed}
+
+
+_store: Optional[TraceStore] = None
+_store_loaded = False
+_store_lock = threading.Lock()
+
+
+def replay_settings() -> dict:
+    cfg = load_config().get("replay", {}) or {}
+    return {
+        "mode": os.environ.get("VOYAGEMATE_REPLAY_MODE") or cfg.get("mode", "off"),
+        "path": os.environ.get("VOYAGEMATE_REPLAY_FILE") or cfg.get("path", "./traces/voyagemate.jsonl.gz"),
+        "latency": os.environ.get("VOYAGEMATE_REPLAY_LATENCY") or cfg.get("latency", "original"),
+    }
+
+
+def get_trace_store() -> Optional[TraceStore]:
+    """Process-wide trace store, or None when record/replay is off."""
+    global _store, _store_loaded
+    if not _store_loaded:
+        with _store_lock:
+            if not _store_loaded:
+                settings = replay_settings()
+                if settings["mode"] not in MODES:
+                    raise ValueError(f"Unknown replay mode: {settings['mode']}")
+                if settings["mode"] != "off":
+                    _store = TraceStore(settings["path"], settings["mode"], settings["latency"])
+                    if _store.mode == "record":
+                        atexit.register(_store.close)
+                _store_loaded = True
+    return _store
+
+
+def replay_active() -> bool:
+    """True while recording or replaying; persistent caches step aside so every call is traced."""
+    return get_trace_store() is not None
+
+
+# ---- HTTP ----
+
+class ReplayResponse:
+    """The parts of `requests.Response` the provider wrappers use."""
+
+    def __init__(self, url: str, status_code: int, text: str):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+def _mask(text: str, secrets: Iterable[str]) -> str:
+    for secret in secrets:
+        if secret:
+            text = text.replace(secret, "***")
+    return text
+
+
+def http_get(url: str, params: dict = None, headers: dict = None, timeout: float = None, redact: Iterable[str] = ()):
+    """
+    `requests.get` through the record/replay layer.
+    `redact` lists secrets embedded in the URL itself (e.g. a key in the path).
+    Headers are sent but never recorded.
+    """
+    store = get_trace_store()
+    if store is None:
+        return requests.get(url, params=params, headers=headers, timeout=timeout)
+
+    request = {
+        "method": "GET",
+        "url": _mask(url, redact),
+        "params": {k: v for k, v in (params or {}).items() if k.lower() not in SECRET_PARAMS},
+    }
+    key = _key("http", request)
+    if store.mode == "replay":
+        response = store.lookup(key)["response"]
+        return ReplayResponse(request["url"], response["status"], response["body"])
+
+    start = time.perf_counter()
+    resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+    store.record("http", key, request, {"status": resp.status_code, "body": resp.text}, time.perf_counter() - start)
+    return resp
+
+
+def traced_call(kind: str, request: Any, fn: Callable[[], Any]) -> Any:
+    """Record/replay a call made through a client library; its result must be JSON-serializable."""
+    store = get_trace_store()
+    if store is None:
+        return fn()
+    key = _key(kind, request)
+    if store.mode == "replay":
+        return store.lookup(key)["response"]
+    start = time.perf_counter()
+    result = fn()
+    store.record(kind, key, request, result, time.perf_counter() - start)
+    return result
+
+
+# ---- LLM ----
+
+class ReplayRunnable:
+    """`llm.bind_tools(...)` (or the bare model) whose `invoke` goes through the trace."""
+
+    def __init__(self, runnable: Any, model_name: str, tools: List, store: TraceStore):
+        self.runnable = runnable
+        self.model_name = model_name
+        self.tools = tools
+        self.store = store
+
+    def invoke(self, messages: List, *args, **kwargs):
+        from langchain_core.messages import message_to_dict, messages_from_dict
+        from utils.llm_cache import _message_fingerprint, llm_cache_key
+
+        key = "llm:" + llm_cache_key(self.model_name, self.tools, messages)
+        if self.store.mode == "replay":
+            message = messages_from_dict([self.store.lookup(key)["response"]])[0]
+            # fresh id, so a replayed message never merges with an earlier one in the graph state
+            message.id = None
+            return message
+
+        start = time.perf_counter()
+        response = self.runnable.invoke(messages, *args, **kwargs)
+        request = {"model": self.model_name, "tools": [getattr(t, "name", None) or getattr(t, "__name__", str(t)) for t in self.tools],
+                   "messages": [_message_fingerprint(m) for m in messages]}
+        self.store.record("llm", key, request, message_to_dict(response), time.perf_counter() - start)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
+
+
+class ReplayLLM:
+    """Chat model wrapper: `bind_tools` and `invoke` are recorded or replayed, everything else passes through."""
+
+    def __init__(self, llm: Any, store: TraceStore):
+        self.llm = llm
+        self.store = store
+
+    def bind_tools(self, tools: List, **kwargs):
+        from utils.llm_cache import model_name_of
+        return ReplayRunnable(self.llm.bind_tools(tools, **kwargs), model_name_of(self.llm), list(tools), self.store)
+
+    def invoke(self, messages: List, *args, **kwargs):
+        from utils.llm_cache import model_name_of
+        return ReplayRunnable(self.llm, model_name_of(self.llm), [], self.store).invoke(messages, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def with_replay(llm: Any) -> Any:
+    """Wrap a chat model in the record/replay layer when it is active."""
+    store = get_trace_store()
+    if store is None:
+        return llm
+    return ReplayLLM(llm, store)
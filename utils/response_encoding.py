@@ -0,0 +1,193 @@
+"""
+Compact, compressed encoding of /query responses.
+
+`split_sections` copies overlapping slices of the LLM output into several
+fields next to `raw`. In the compact format every text field that is a
+verbatim slice of `raw` is sent as a `[start, end]` character offset pair
+into it instead (Python string indices, i.e. code points); fields that are
+not verbatim slices stay strings. `expand_sections` restores the full shape.
+
+Responses are serialized (orjson when installed, json otherwise) and
+compressed with brotli or gzip when the client accepts it and the plan is
+large enough to be worth it. The body is built in full before the response
+starts, so a serialization error becomes a 500, not a truncated 200.
+"""
+import json
+import threading
+import zlib
+from typing import Iterable, List, Optional
+
+from starlette.responses import Response
+
+from utils.config_loader import load_config
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, json is the fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+FORMATS = ("full", "compact")
+
+# text fields that are usually verbatim slices of `raw`
+SPAN_FIELDS = ("intro", "generic_plan", "offbeat_plan", "cost_breakdown_text", "weather", "daily_budget")
+
+# always returned, whatever `fields` selects
+ALWAYS_FIELDS = ("session_id", "plan_cache_hit", "format", "_meta")
+
+
+def _span(raw: str, text, start: int = 0):
+    """`[start, end]` of `text` in `raw` (searching from `start` first), or `text` itself."""
+    if not isinstance(text, str) or not text:
+        return text
+    index = raw.find(text, start)
+    if index == -1 and start:
+        index = raw.find(text)
+    return [index, index + len(text)] if index != -1 else text
+
+
+def _slice(raw: str, value):
+    return raw[value[0]:value[1]] if isinstance(value, list) else value
+
+
+def compact_sections(sections: dict) -> dict:
+    """Replace text fields that are slices of `raw` by offset pairs."""
+    raw = sections.get("raw") or ""
+    compact = dict(sections)
+    if not raw:
+        return compact
+    for name in SPAN_FIELDS:
+        if name in compact:
+            compact[name] = _span(raw, compact[name])
+    days = []
+    position = 0
+    for entry in sections.get("day_by_day") or []:
+        day = _span(raw, entry.get("day"), position)
+        if isinstance(day, list):
+            position = day[1]
+        text = _span(raw, entry.get("text"), position)
+        if isinstance(text, list):
+            position = text[1]
+        days.append({**entry, "day": day, "text": text})
+    if "day_by_day" in compact:
+        compact["day_by_day"] = days
+    compact["format"] = "compact"
+    return compact
+
+
+def expand_sections(compact: dict) -> dict:
+    """Inverse of `compact_sections`."""
+    if compact.get("format") != "compact":
+        return compact
+    raw = compact.get("raw") or ""
+    sections = {k: v for k, v in compact.items() if k != "format"}
+    for name in SPAN_FIELDS:
+        if name in sections:
+            sections[name] = _slice(raw, sections[name])
+    if "day_by_day" in sections:
+        sections["day_by_day"] = [{**d, "day": _slice(raw, d.get("day")), "text": _slice(raw, d.get("text"))}
+                                  for d in sections["day_by_day"]]
+    return sections
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """`"day_by_day,costs"` -> `["day_by_day", "costs"]`; None or empty selects everything."""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+
+def select_fields(payload: dict, fields: Optional[Iterable[str]]) -> dict:
+    """Keep only `fields` (plus bookkeeping keys). Offsets need `raw`, so it is kept when a selected field uses them."""
+    if fields is None:
+        return payload
+    wanted = set(fields) | set(ALWAYS_FIELDS)
+    selected = {k: v for k, v in payload.items() if k in wanted}
+    if payload.get("format") == "compact" and "raw" not in selected and _uses_spans(selected):
+        selected["raw"] = payload.get("raw", "")
+    return selected
+
+
+def _uses_spans(payload: dict) -> bool:
+    if any(isinstance(payload.get(name), list) for name in SPAN_FIELDS):
+        return True
+    return any(isinstance(d.get("day"), list) or isinstance(d.get("text"), list) for d in payload.get("day_by_day") or [])
+
+
+def _text_size(payload: dict) -> int:
+    """Rough payload size: the text fields, which dominate it."""
+    size = sum(len(v) for v in payload.values() if isinstance(v, str))
+    return size + sum(len(d.get("text")) for d in payload.get("day_by_day") or [] if isinstance(d.get("text"), str))
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported content coding from an Accept-Encoding header: br, then gzip."""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.partition(";")
+        q = params.strip()
+        try:
+            weight = float(q[2:]) if q.startswith("q=") else 1.0
+        except ValueError:
+            weight = 1.0
+        if coding.strip() and weight > 0:
+            accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5 if level is None else level)
+    compressor = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress(body) + compressor.flush()
+
+
+_settings: Optional[dict] = None
+_settings_lock = threading.Lock()
+
+
+def response_settings() -> dict:
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = load_config().get("responses", {}) or {}
+    return _settings
+
+
+def plan_response(payload: dict, fmt: str = "full", fields: Optional[str] = None,
+                  accept_encoding: Optional[str] = None) -> Response:
+    """Encode a plan payload for /query: optional compact offsets, field selection, compression."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown response format: {fmt}")
+    if fmt == "compact":
+        payload = compact_sections(payload)
+    payload = select_fields(payload, parse_fields(fields))
+
+    settings = response_settings()
+    encoding = negotiate_encoding(accept_encoding) if settings.get("compress", True) else None
+    # small payloads are not worth compressing
+    if encoding and _text_size(payload) < settings.get("compress_min_bytes", 1024):
+        encoding = None
+
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        level = settings.get("brotli_quality") if encoding == "br" else settings.get("gzip_level")
+        body = compress(body, encoding, level)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,40 +1,233 @@
 import os
+import json
+import html
+import hashlib
+import logging
 import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
 
-def save_document(response_text: str, directory: str = "./output"):
-    """Export travel plan to Markdown file with proper formatting"""
-    os.makedirs(directory, exist_ok=True)
-    
-    
-    # Create markdown content with metadata header
-    markdown_content = f"""# 🌍 AI Travel Plan
+from utils.config_loader import load_config
+from utils.itinerary import currency_symbol
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"md": "text/markdown", "json": "application/json", "html": "text/html"}
+
+DISCLAIMER = ("This travel plan was generated by AI. Please verify all information, especially prices, "
+              "operating hours, and travel requirements before your trip.")
+
+
+def render_markdown(response_text: str) -> str:
+    """Travel plan as Markdown with a metadata header"""
+    return (
+        "# 🌍 AI Travel Plan\n\n"
+        f"**Generated:** {datetime.datetime.now().strftime('%Y-%m-%d at %H:%M')}  \n"
+        "**Created by:** VoyageMate AI\n\n"
+        "---\n\n"
+        f"{response_text}\n\n"
+        "---\n\n"
+        f"*{DISCLAIMER}*\n"
+    )
+
+
+def render_json(sections: dict) -> str:
+    """Parsed sections as compact JSON"""
+    return json.dumps(sections, ensure_ascii=False, separators=(",", ":"))
+
+
+def format_amount(value: Any, symbol: str) -> str:
+    """'₹1,200' for numbers; anything else (an already formatted '₹1,200', 'N/A') as given"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    return f"{symbol}{value:,}" if isinstance(value, int) else f"{symbol}{value:,.2f}"
 
-    # **Generated:** {datetime.datetime.now().strftime('%Y-%m-%d at %H:%M')}  
-    # **Created by:** Atriyo's Travel Agent
 
-    ---
+def render_html(sections: dict, currency: str = "INR") -> str:
+    """Compact, print-friendly HTML (ready for browser print-to-PDF); costs in the plan's currency, else `currency`"""
+    esc = html.escape
+    symbol = currency_symbol(sections.get("currency") or currency)
+    parts = [
+        "<!doctype html><html><head><meta charset=\"utf-8\"><title>VoyageMate AI Travel Plan</title>",
+        "<style>body{font:14px/1.5 sans-serif;max-width:48em;margin:2em auto}h2{page-break-after:avoid}"
+        "section{page-break-inside:avoid}pre{white-space:pre-wrap;font:inherit}"
+        "@page{margin:1.5cm}</style></head><body><h1>🌍 AI Travel Plan</h1>",
+    ]
+    if sections.get("intro"):
+        parts.append(f"<pre>{esc(sections['intro'])}</pre>")
+    if sections.get("weather"):
+        parts.append(f"<section><h2>Weather</h2><pre>{esc(sections['weather'])}</pre></section>")
+    for d in sections.get("day_by_day") or []:
+        parts.append(f"<section><h2>{esc(d.get('day', 'Day'))}</h2><pre>{esc(d.get('text', ''))}</pre></section>")
+    if not sections.get("day_by_day"):
+        for key, title in (("generic_plan", "Generic Tourist Plan"), ("offbeat_plan", "Off-Beat Plan")):
+            if sections.get(key):
+                parts.append(f"<section><h2>{title}</h2><pre>{esc(sections[key])}</pre></section>")
+    costs = sections.get("costs") or {}
+    if costs:
+        rows = "".join(f"<tr><td>{esc(str(k))}</td><td>{esc(format_amount(v, symbol))}</td></tr>" for k, v in costs.items())
+        parts.append(f"<section><h2>Cost Breakdown</h2><table>{rows}</table></section>")
+    if sections.get("daily_budget"):
+        parts.append(f"<section><h2>Daily Expense Budget</h2><pre>{esc(sections['daily_budget'])}</pre></section>")
+    parts.append(f"<hr><p><em>{esc(DISCLAIMER)}</em></p></body></html>")
+    return "".join(parts)
 
-    {response_text}
 
-    ---
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:20]
 
-    *This travel plan was generated by AI. Please verify all information, especially prices, operating hours, and travel requirements before your trip.*
+
+def export_filename(sections: dict, fmt: str) -> str:
     """
-            
-    try:
-        # Write to markdown file with UTF-8 encoding
-        # Generate timestamp-based filename
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filename = f"{directory}/VOYAGEMATE AI{timestamp}.md"
+    Content-addressed filename: identical exports map to the same file.
+    Markdown is rendered from `raw` alone; JSON and HTML from all sections,
+    so those hash the whole (canonically serialized) section dict.
+    """
+    if fmt == "md":
+        content = sections.get("raw") or ""
+    else:
+        content = json.dumps(sections, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return f"voyagemate-{content_hash(content)}.{fmt}"
+
+
+def _write_atomic(path: str, content: str) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+class DocumentExporter:
+    """
+    Background export pipeline.
+    Filenames are known as soon as a job is submitted; rendering and the
+    blocking writes run in a small writer pool off the request path.
+    Files that already exist are not rewritten. Exports that fail are
+    remembered (the most recent `max_failed`) so downloads can report the
+    error; submitting the same content again retries.
+    """
+
+    def __init__(self, directory: str = "./output", max_workers: int = 2, currency: str = "INR",
+                 max_failed: int = 256):
+        self.directory = directory
+        self.currency = currency
+        self.max_failed = max_failed
+        os.makedirs(directory, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._pending: Dict[str, Future] = {}
+        self._failed: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
 
-        print(filename)
+    def _render(self, sections: dict, fmt: str) -> str:
+        if fmt == "md":
+            return render_markdown(sections.get("raw", ""))
+        if fmt == "json":
+            return render_json(sections)
+        if fmt == "html":
+            return render_html(sections, self.currency)
+        raise ValueError(f"Unsupported export format: {fmt}")
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-        
-        print(f"Markdown file saved as: {filename}")
+    def _write(self, name: str, sections: dict, fmt: str) -> str:
+        path = os.path.join(self.directory, name)
+        try:
+            if not os.path.exists(path):
+                _write_atomic(path, self._render(sections, fmt))
+                logger.info("Exported %s", path)
+            return path
+        except Exception as e:
+            logger.error("Error exporting %s: %s", path, e)
+            with self._lock:
+                self._failed[name] = f"{type(e).__name__}: {e}"
+                while len(self._failed) > self.max_failed:
+                    self._failed.popitem(last=False)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(name, None)
+
+    def submit(self, sections: dict, formats: Iterable[str] = ("md",)) -> Dict[str, str]:
+        """Queue exports and return {format: filename} immediately"""
+        names = {}
+        for fmt in formats:
+            if fmt not in EXPORT_FORMATS:
+                raise ValueError(f"Unsupported export format: {fmt}")
+            name = export_filename(sections, fmt)
+            names[fmt] = name
+            with self._lock:
+                if name in self._pending or os.path.exists(os.path.join(self.directory, name)):
+                    continue
+                self._failed.pop(name, None)
+                self._pending[name] = self._pool.submit(self._write, name, sections, fmt)
+        return names
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Path of a finished export, or None if it does not exist (yet)"""
+        if os.path.basename(name) != name or name.endswith(".tmp"):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def is_pending(self, name: str) -> bool:
+        with self._lock:
+            return name in self._pending
+
+    def error_for(self, name: str) -> Optional[str]:
+        """Why the export `name` failed, or None"""
+        with self._lock:
+            return self._failed.get(name)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_exporter: Optional[DocumentExporter] = None
+_exporter_lock = threading.Lock()
+_settings: Optional[dict] = None
+
+
+def export_settings() -> dict:
+    """The `exports` config section; VOYAGEMATE_EXPORTS_ACCEL_REDIRECT overrides accel_redirect"""
+    global _settings
+    with _exporter_lock:
+        if _settings is None:
+            _settings = dict(load_config().get("exports", {}) or {})
+            override = os.environ.get("VOYAGEMATE_EXPORTS_ACCEL_REDIRECT")
+            if override is not None:
+                _settings["accel_redirect"] = override
+        return _settings
+
+
+def accel_redirect_path(name: str) -> Optional[str]:
+    """
+    Internal URI for a reverse proxy (nginx X-Accel-Redirect) to serve an
+    export with sendfile, or None when no proxy prefix is configured.
+    """
+    prefix = export_settings().get("accel_redirect")
+    return f"{prefix.rstrip('/')}/{name}" if prefix else None
+
+
+def get_exporter(directory: Optional[str] = None) -> DocumentExporter:
+    """Process-wide exporter"""
+    global _exporter
+    settings = export_settings()
+    directory = directory or settings.get("directory", "./output")
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = DocumentExporter(directory, currency=settings.get("currency", "INR"))
+        return _exporter
+
+
+def save_document(response_text: str, directory: str = "./output"):
+    """Export travel plan to Markdown file with proper formatting (synchronous)"""
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, export_filename({"raw": response_text}, "md"))
+    try:
+        if not os.path.exists(filename):
+            _write_atomic(filename, render_markdown(response_text))
+        logger.info("Markdown file saved as: %s", filename)
         return filename
-        
     except Exception as e:
-        print(f"Error saving markdown file: {e}")
-        return None
\ No newline at end of file
+        logger.error("Error saving markdown file: %s", e)
+        return None
@@ -0,0 +1,246 @@
+"""
+Server-side conversation sessions for incremental re-planning.
+
+A session keeps the agent's message history (including tool results) and the
+parsed sections of the latest plan, so a follow-up like "make day 3 cheaper"
+can continue the conversation instead of regenerating everything.
+
+Sessions are stored as compact blobs (utils.cache.dumps: msgpack/JSON plus
+zlib) in an LRU with TTL. When the shared cache has an L2 backend, sessions
+are written through to it so any worker can continue a session.
+"""
+import logging
+import re
+import threading
+import uuid
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import ToolMessage, messages_from_dict, messages_to_dict
+
+from utils.cache import LRUCache, dumps, get_cache, loads
+from utils.config_loader import load_config
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = 5000, ttl: float = 3600, max_messages: int = 40, l2=None):
+        self.l1 = LRUCache(max_sessions)
+        self.l2 = l2
+        self.ttl = ttl
+        self.max_messages = max_messages
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def _key(self, session_id: str) -> str:
+        return f"voyagemate:session:{session_id}"
+
+    def load(self, session_id: str) -> Optional[Tuple[List, dict]]:
+        """Return (messages, sections) for a session, or None if unknown/expired."""
+        key = self._key(session_id)
+        blob = self.l1.get(key)
+        if blob is None and self.l2 is not None:
+            try:
+                blob = self.l2.get(key)
+            except Exception:
+                blob = None
+            if blob is not None:
+                self.l1.set(key, blob, self.ttl)
+        if blob is None:
+            return None
+        try:
+            data = loads(blob)
+            return messages_from_dict(data["messages"]), data["sections"]
+        except Exception as e:
+            # a truncated or old-format session is a miss; the request starts a new one
+            logger.warning("Session %s could not be decoded: %s", session_id, e)
+            return None
+
+    def save(self, session_id: str, messages: List, sections: dict) -> None:
+        """Store the latest state; the history is trimmed to the most recent messages."""
+        messages = self._trim(close_tool_calls(messages))
+        blob = dumps({"messages": messages_to_dict(messages), "sections": sections})
+        key = self._key(session_id)
+        self.l1.set(key, blob, self.ttl)
+        if self.l2 is not None:
+            try:
+                self.l2.set(key, blob, self.ttl)
+            except Exception:
+                pass
+
+    def _trim(self, messages: List) -> List:
+        """
+        Drop the oldest turns. The history always starts on a human message, so
+        no tool result is orphaned from its call; a single turn longer than
+        max_messages is kept whole rather than dropped.
+        """
+        if len(messages) <= self.max_messages:
+            return list(messages)
+        turns = [i for i, m in enumerate(messages) if m.type == "human"]
+        if not turns:
+            return list(messages)
+        window = len(messages) - self.max_messages
+        start = next((i for i in turns if i >= window), turns[-1])
+        return list(messages[start:])
+
+    def __len__(self):
+        return len(self.l1)
+
+
+def close_tool_calls(messages: List) -> List:
+    """
+    Answer tool calls left open at the end of a run (the final Itinerary call
+    in structured mode), so a follow-up can append a human message: chat APIs
+    reject a history with a tool call that has no tool result.
+    """
+    if not messages:
+        return list(messages)
+    answered = {getattr(m, "tool_call_id", None) for m in messages if m.type == "tool"}
+    last = messages[-1]
+    missing = [tc for tc in getattr(last, "tool_calls", None) or [] if tc.get("id") not in answered]
+    return list(messages) + [ToolMessage(content="Submitted.", tool_call_id=tc["id"], name=tc["name"]) for tc in missing]
+
+
+# "Day 3: Beaches", "Off-Beat Day 03 - Caves", "D3"
+_DAY_LINE = re.compile(r"^\s*(?:Off-?Beat\s+)?(?:Day|D)\s*0*(\d+)\b", re.I)
+
+# plan text fields, merged day by day; their day_by_day entries carry the same "plan" tag
+PLAN_FIELDS = {"generic": "generic_plan", "offbeat": "offbeat_plan"}
+# "Label: value" blocks, merged line by line
+LINE_FIELDS = ("cost_breakdown_text", "daily_budget")
+# derived from the whole reply rather than a heading the re-plan targets: kept, new entries added
+LIST_FIELDS = ("attractions_list", "tools_used")
+# text outside every heading; a re-plan's is only a preamble to its changes
+KEPT_FIELDS = ("intro",)
+
+# response bookkeeping, never part of a stored plan
+_NOT_SECTIONS = ("updated_sections", "session_id", "plan_cache_hit", "format", "_meta")
+
+
+def _day_label(day: str) -> str:
+    """'Day 3: Beaches' -> 'day 3', 'Off-Beat Day 03 - Caves' -> 'day 3'"""
+    m = _DAY_LINE.match(day or "")
+    return f"day {m.group(1)}" if m else (day or "").split(":")[0].strip().lower()
+
+
+def _plan_blocks(text: str) -> Tuple[str, dict]:
+    """Plan text -> (text before the first day, {day label: that day's block})."""
+    preamble, blocks, label = [], {}, None
+    for line in (text or "").splitlines():
+        if _DAY_LINE.match(line):
+            label = _day_label(line)
+            blocks[label] = [line]
+        elif label is None:
+            preamble.append(line)
+        else:
+            blocks[label].append(line)
+    return "\n".join(preamble).strip(), {k: "\n".join(v).strip() for k, v in blocks.items()}
+
+
+def _merge_plan_text(old: str, new: str) -> str:
+    """Replace the days `new` covers inside `old`; a plan without days replaces it whole."""
+    if not old or not new:
+        return new or old
+    preamble, days = _plan_blocks(old)
+    _, new_days = _plan_blocks(new)
+    if not new_days:
+        return new
+    return "\n\n".join(filter(None, [preamble, *{**days, **new_days}.values()]))
+
+
+def _line_label(line: str) -> Optional[str]:
+    label, sep, _ = line.partition(":")
+    label = label.strip(" \t-*•").lower()
+    return label if sep and label else None
+
+
+def _merge_lines(old: str, new: str) -> str:
+    """Replace lines of `old` whose label ('Hotel: ...') appears in `new`; add the rest."""
+    if not old or not new:
+        return new or old
+    lines = old.splitlines()
+    index = {_line_label(line): i for i, line in enumerate(lines) if _line_label(line)}
+    seen = {line.strip() for line in lines}
+    for line in new.splitlines():
+        label = _line_label(line)
+        if label in index:
+            lines[index[label]] = line
+        elif line.strip() and line.strip() not in seen:
+            lines.append(line)
+            if label:
+                index[label] = len(lines) - 1
+        seen.add(line.strip())
+    return "\n".join(lines)
+
+
+def merge_sections(previous: dict, updated: dict) -> dict:
+    """
+    Overlay the sections of a re-plan onto the previous plan.
+    The re-plan reply usually covers only what changed, so nothing it leaves out
+    is dropped: days are replaced per day within their plan (generic or off-beat),
+    cost and budget lines per label, and fields derived from the whole reply
+    (intro, attractions, tools) keep the previous plan's. `raw` (the text the raw
+    view, downloads and exports use) stays the full plan with the reply appended
+    as an update.
+    """
+    merged = {k: v for k, v in previous.items() if k not in _NOT_SECTIONS}
+
+    # days the reply gives outside a plan heading go to the plan that already has that day
+    known = {(d.get("plan", ""), _day_label(d.get("day"))) for d in previous.get("day_by_day") or []}
+    new_days, extra = [], {plan: [] for plan in PLAN_FIELDS}
+    for d in updated.get("day_by_day") or []:
+        plan, label = d.get("plan", ""), _day_label(d.get("day"))
+        if not plan and ("", label) not in known:
+            plan = next((p for p in PLAN_FIELDS if (p, label) in known), "")
+            if plan:
+                extra[plan].append(f"{d['day']}\n{d.get('text', '')}".strip())
+        new_days.append({**d, "plan": plan})
+
+    for plan, field in PLAN_FIELDS.items():
+        text = "\n\n".join(filter(None, [updated.get(field) or "", *extra[plan]]))
+        merged[field] = _merge_plan_text(previous.get(field) or "", text)
+    for field in LINE_FIELDS:
+        merged[field] = _merge_lines(previous.get(field) or "", updated.get(field) or "")
+    for field in LIST_FIELDS:
+        old = list(previous.get(field) or [])
+        merged[field] = old + [v for v in updated.get(field) or [] if v not in old]
+    if updated.get("costs"):
+        merged["costs"] = {**previous.get("costs", {}), **updated["costs"]}
+    if new_days:
+        replace = {(d["plan"], _day_label(d.get("day"))): d for d in new_days}
+        days = [replace.pop((d.get("plan", ""), _day_label(d.get("day"))), d) for d in previous.get("day_by_day") or []]
+        merged["day_by_day"] = days + list(replace.values())
+    handled = set(PLAN_FIELDS.values()) | set(LINE_FIELDS) | set(LIST_FIELDS) | set(KEPT_FIELDS)
+    for key, value in updated.items():
+        # anything else the reply fills (weather, daily_weather...) replaces the old value
+        if key in handled or key in ("raw", "day_by_day", "costs") or key in _NOT_SECTIONS or not value:
+            continue
+        merged[key] = value
+
+    reply = (updated.get("raw") or "").strip()
+    raw = previous.get("raw") or ""
+    merged["raw"] = f"{raw.rstrip()}\n\n---\n\n## Updated\n\n{reply}" if raw and reply else raw or reply
+    merged["updated_sections"] = [k for k, v in merged.items() if k != "raw" and v and v != previous.get(k)]
+    return merged
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store built from the `sessions` config section."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            cfg = load_config().get("sessions", {})
+            cache = get_cache()
+            _store = SessionStore(
+                max_sessions=cfg.get("max_sessions", 5000),
+                ttl=cfg.get("ttl", 3600),
+                max_messages=cfg.get("max_messages", 40),
+                l2=cache.l2 if cache is not None else None,
+            )
+        return _store
@@ -0,0 +1,139 @@
+import copy
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """A single in-flight upstream call that followers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into one upstream request.
+
+    The first caller for a key (the leader) runs the function; every caller that
+    arrives with the same key while the leader is still running waits and gets
+    a copy of the leader's result (or the same exception), so no caller can
+    change what another one sees. Nothing is kept once the call finishes, so
+    this is independent of any TTL caching.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` once per key among concurrent callers."""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                call.followers += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            # no follower can join once the key is gone; they copy from a snapshot
+            # the leader's caller cannot mutate
+            try:
+                if call.followers and call.error is None:
+                    try:
+                        call.result = copy.deepcopy(result)
+                    except Exception as e:
+                        # e.g. a result holding a lock or client: followers get the error, not a hang
+                        call.error = e
+            finally:
+                call.done.set()
+        return result
+
+    def stats(self) -> dict:
+        """Return call counters and the share (hit) rate."""
+        with self._lock:
+            calls, shared, in_flight = self.calls, self.shared, len(self._calls)
+        return {
+            "calls": calls,
+            "shared": shared,
+            "upstream": calls - shared,
+            "in_flight": in_flight,
+            "hit_rate": round(shared / calls, 4) if calls else 0.0,
+        }
+
+
+def _freeze(value: Any) -> Hashable:
+    """Turn call arguments into a hashable key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def instance_key(obj: Any) -> Hashable:
+    """The wrapper's settings (API key, base URL, headers...), so differently configured instances never share."""
+    settings = {k: v for k, v in vars(obj).items() if isinstance(v, (str, int, float, bool, type(None), dict, list, tuple))}
+    return (type(obj).__qualname__, _freeze(settings))
+
+
+# One registry per upstream provider so metrics can be reported separately
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(provider: str) -> SingleFlight:
+    """Return the shared SingleFlight for `provider`, creating it if needed."""
+    with _flights_lock:
+        flight = _flights.get(provider)
+        if flight is None:
+            flight = _flights[provider] = SingleFlight()
+        return flight
+
+
+def single_flight(provider: str):
+    """
+    Decorator for provider wrapper methods.
+    Identical concurrent calls (same method, arguments and wrapper settings)
+    share one upstream request. Instances are keyed by their settings rather
+    than their identity, so equally configured wrappers (one per GraphBuilder
+    run) still coalesce while ones with different API keys do not.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            key = (fn.__qualname__, instance_key(self), _freeze(args), _freeze(kwargs))
+            return get_flight(provider).do(key, fn, self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def single_flight_stats() -> dict:
+    """Per-provider single-flight metrics."""
+    with _flights_lock:
+        flights = dict(_flights)
+    return {name: flight.stats() for name, flight in flights.items()}
@@ -1,10 +1,18 @@
-import requests
+import datetime
+from collections import Counter
+from utils.cache import cached
+from utils.single_flight import single_flight
+from utils.quota import metered
+from utils.replay import http_get
 
 class WeatherForecastTool:
     def __init__(self, api_key:str):
         self.api_key = api_key
         self.base_url = "https://api.openweathermap.org/data/2.5"
 
+    @cached("weather", provider="openweather")
+    @single_flight("openweather")
+    @metered("openweather")
     def get_current_weather(self, place:str):
         """Get current weather of a place"""
         try:
@@ -13,22 +21,108 @@ class WeatherForecastTool:
                 "q": place,
                 "appid": self.api_key,
             }
-            response = requests.get(url, params=params)
+            response = http_get(url, params=params)
             return response.json() if response.status_code == 200 else {}
         except Exception as e:
             raise e
     
-    def get_forecast_weather(self, place:str):
-        """Get weather forecast of a place"""
+    @single_flight("openweather")
+    @metered("openweather")
+    def get_forecast_weather(self, place:str, cnt:int = 40):
+        """Get weather forecast of a place (3-hour slots, at most 40 = 5 days)"""
         try:
             url = f"{self.base_url}/forecast"
             params = {
                 "q": place,
                 "appid": self.api_key,
-                "cnt": 10,
+                "cnt": max(1, min(cnt, MAX_FORECAST_SLOTS)),
                 "units": "metric"
             }
-            response = requests.get(url, params=params)
+            response = http_get(url, params=params)
             return response.json() if response.status_code == 200 else {}
         except Exception as e:
-            raise e
\ No newline at end of file
+            raise e
+
+    @cached("weather", provider="openweather")
+    def get_daily_forecast(self, place:str, start_date:str = None, days:int = None):
+        """
+        Per-day forecast for the trip window.
+        The full 5-day forecast is always requested (so the upstream request, and its
+        replay key, does not depend on the time of day) and trimmed to the window
+        here; the aggregated days (not the raw slots) are what gets cached.
+        """
+        start = datetime.date.fromisoformat(start_date) if start_date else None
+        if start and days and start + datetime.timedelta(days=days) <= datetime.date.today():
+            return []
+        forecast = self.get_forecast_weather(place, cnt=MAX_FORECAST_SLOTS)
+        # without a start date the window opens on the forecast's first local day, not the
+        # clock's, so a replayed trace is trimmed the way it was when recorded
+        first = start or forecast_first_day(forecast)
+        end = first + datetime.timedelta(days=days) if days and first else None
+        return aggregate_daily(forecast, start, end)
+
+
+MAX_FORECAST_SLOTS = 40
+
+
+def forecast_first_day(forecast: dict):
+    """Local date of the first forecast slot, or None for an empty forecast."""
+    if not forecast or not forecast.get("list"):
+        return None
+    offset = datetime.timedelta(seconds=(forecast.get("city") or {}).get("timezone", 0))
+    return (datetime.datetime.fromtimestamp(forecast["list"][0]["dt"], datetime.timezone.utc) + offset).date()
+
+
+def aggregate_daily(forecast: dict, start: datetime.date = None, end: datetime.date = None) -> list:
+    """
+    Collapse 3-hour forecast slots into per-day summaries in a single pass.
+    Days are local to the city (OpenWeather's timezone offset); `end` is exclusive.
+    """
+    if not forecast or "list" not in forecast:
+        return []
+    offset = datetime.timedelta(seconds=(forecast.get("city") or {}).get("timezone", 0))
+    days = {}
+    for item in forecast["list"]:
+        day = (datetime.datetime.fromtimestamp(item["dt"], datetime.timezone.utc) + offset).date()
+        if (start and day < start) or (end and day >= end):
+            continue
+        main = item.get("main", {})
+        acc = days.get(day)
+        if acc is None:
+            acc = days[day] = {"min": main.get("temp_min", main.get("temp")), "max": main.get("temp_max", main.get("temp")),
+                               "temp_sum": 0.0, "humidity_sum": 0.0, "n": 0, "pop": 0.0, "rain": 0.0, "wind": 0.0,
+                               "conditions": Counter()}
+        acc["min"] = min(acc["min"], main.get("temp_min", main.get("temp")))
+        acc["max"] = max(acc["max"], main.get("temp_max", main.get("temp")))
+        acc["temp_sum"] += main.get("temp", 0.0)
+        acc["humidity_sum"] += main.get("humidity", 0.0)
+        acc["n"] += 1
+        acc["pop"] = max(acc["pop"], item.get("pop", 0.0))
+        acc["rain"] += (item.get("rain") or {}).get("3h", 0.0)
+        acc["wind"] = max(acc["wind"], (item.get("wind") or {}).get("speed", 0.0))
+        for w in item.get("weather", []):
+            acc["conditions"][w.get("description", "")] += 1
+
+    return [
+        {
+            "date": day.isoformat(),
+            "temp_min": round(acc["min"], 1),
+            "temp_max": round(acc["max"], 1),
+            "temp_avg": round(acc["temp_sum"] / acc["n"], 1),
+            "humidity": round(acc["humidity_sum"] / acc["n"]),
+            "rain_chance": round(acc["pop"] * 100),
+            "rain_mm": round(acc["rain"], 1),
+            "wind_max": round(acc["wind"], 1),
+            "description": acc["conditions"].most_common(1)[0][0] if acc["conditions"] else "",
+        }
+        for day, acc in sorted(days.items())
+    ]
+
+
+def format_daily_forecast(days: list) -> str:
+    """One compact line per day for the LLM"""
+    return "\n".join(
+        f"{d['date']}: {d['temp_min']}-{d['temp_max']}°C, {d['description']}, rain chance {d['rain_chance']}%"
+        + (f" ({d['rain_mm']} mm)" if d["rain_mm"] else "")
+        for d in days
+    )